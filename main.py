@@ -1,9 +1,18 @@
 from typing import Optional, List
-from pydantic import BaseModel, Field
-import os
-from openai import OpenAI
+from pydantic import BaseModel, Field, model_validator
+import asyncio
+import logging
+import sys
+import textwrap
 from dotenv import load_dotenv
 from utils.wiki_parsing import ContentProcessor
+from utils.llm_cache import LLMCache
+from utils.pipeline_cache import PipelineCache
+from utils.clients import client as openai_client, get_async_client, run_async
+
+log = logging.getLogger(__name__)
+
+SEPARATOR = "----------------------------------"
 
 load_dotenv()
 
@@ -28,6 +37,15 @@ class Expertise(BaseModel):
     programming_languages: Optional[List[str]] = Field(description="programming languages the expert should be fluent in")
     languages: Optional[List[str]] = Field(description="languages the expert should be fluent in")
 
+    @model_validator(mode="after")
+    def intern_values(self) -> "Expertise":
+        # the same qualifications ("PhD in Political Science") recur across experts, so share one copy of each string
+        for field_name in type(self).model_fields:
+            values = getattr(self, field_name)
+            if values:
+                setattr(self, field_name, [sys.intern(value) for value in values])
+        return self
+
 class ExpertProfile(BaseModel):
     expert_name: str = Field(description="name of the expert")
     rationale: str = Field(description="Explanation for selecting the expert.")
@@ -73,30 +91,73 @@ class Investigator:
     """Investigator class to determine the experts needed to evaluate the content"""
 
     def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.system_prompt =    f"""
-                                    You are an Investigator specialized in evaluating factual content for bias and accuracy. In this case you will be evaluating Wikipedia content. What makes you so good at this task is you have a vast rolodex of experts in all fields at your disposal, and you have a unique ability to identify the most relevant experts for any given topic.
-                                """
+        self.openai_client = openai_client
+        self.llm_cache = LLMCache()
+        # Prompts are dedented once here so the source indentation is not sent (and billed) on every call
+        self.system_prompt = textwrap.dedent("""
+            You are an Investigator specialized in evaluating factual content for bias and accuracy. In this case you will be evaluating Wikipedia content. What makes you so good at this task is you have a vast rolodex of experts in all fields at your disposal, and you have a unique ability to identify the most relevant experts for any given topic.
+        """).strip()
+        self._content_tpl = textwrap.dedent("""
+            Wikipedia Content on {topic}:
+            ```
+            {content}
+            ```
+        """).strip()
+        self._initial_tpl = textwrap.dedent("""
+            Read the Wikipedia content above and identify a balanced panel of 3 experts to evaluate the content for bias and accuracy. It is important that the panel is able to evaluate all viewpoints on the subject matter.
+        """).strip()
+        self._analysis_tpl = textwrap.dedent("""
+            The experts you selected have provided analysis of the content.
+            You can find their analysis in the dictionary below with expert name as the key:
+            {expert_opinion}
+
+            It is up to you to decide what changes need to be made to the content to make it more accurate and unbiased. Remember the following:
+            - You are not obligated to make any changes, but if you do, you need to provide a rationale for the changes you made.
+            - You should consider the impact of bias on your expert's analysis.
+            - Changes should NOT remove any factual content or proper nouns, only add context and nuance.
+            - Make sure that any corrections you identify are accurately reflected in the content.
+            - You need to provide a summary of the experts used, biases detected, who benefitted from the bias, and suggested corrections.
+        """).strip()
+        self._final_content_tpl = textwrap.dedent("""
+            Now that you have decided on the suggested corrections, please apply them to the content. When you apply the corrections be sure to apply them in the following way:
+
+            Example:
+            Original text: "The conflict began in 1948."
+
+            SuggestedCorrection:
+            text_added: "following the UN partition plan"
+            text_removed: "in"
+
+            Modified text: "The conflict began [following the UN partition plan]."
+
+            Apply all corrections to the content maintaining proper grammar and flow.
+
+            Here is a list of the suggested corrections:
+            {bias_instance}
+        """).strip()
         self.chat_history: List[str] = []
+        self._messages_prefix: List[dict] = []
 
     def get_experts_needed(self, topic: str, content: str) -> ExpertsNeeded:
-        initial_message =    f"""
-                                Read the following Wikipedia content on {topic} and identify a balanced panel of 3 experts to evaluate the content for bias and accuracy. It is important that the panel is able to evaluate all viewpoints on the subject matter.
-
-                                Wikipedia Content:
-                                ```
-                                {content}
-                                ```
-                            """
+        # The article goes in its own message straight after the system prompt and is reused verbatim by every
+        # later call, so that large prefix stays byte-identical and can hit OpenAI's automatic prompt cache.
+        content_message = self._content_tpl.format(topic=topic, content=content)
+        initial_message = self._initial_tpl
+        self.chat_history.append(content_message)
         self.chat_history.append(initial_message)
 
-        response = self.openai_client.beta.chat.completions.parse(
+        response = self.llm_cache.parse(
+            self.openai_client,
             model="gpt-4o-mini",
             messages=[
                 {
                     "role": "system",
                     "content": self.system_prompt
                 },
+                {
+                    "role": "user",
+                    "content": content_message
+                },
                 {
                     "role": "user",
                     "content": initial_message
@@ -104,228 +165,268 @@ class Investigator:
             ],
             response_format=ExpertsNeeded
         )
-        self.chat_history.append(response.choices[0].message.content)
-        return response.choices[0].message.parsed
+        self.chat_history.append(response)
+        # built once so follow-up calls reuse the exact same prefix instead of rebuilding it from chat_history
+        self._messages_prefix = [
+            {
+                "role": "system",
+                "content": self.system_prompt
+            },
+            *[
+                {
+                    "role": "user",
+                    "content": message
+                } for message in self.chat_history
+            ]
+        ]
+        return ExpertsNeeded.model_validate_json(response)
     
     def analyze_expert_opinions(self, expert_opinion: List[ExpertAnalysisWithName]) -> ExpertAnalysis:
-        response = self.openai_client.beta.chat.completions.parse(
+        response = self.llm_cache.parse(
+            self.openai_client,
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": self.system_prompt
-                },
-                *[
-                    {
-                        "role": "user",
-                        "content": message
-                    } for message in self.chat_history
-                ],
+            messages=self._messages_prefix + [
                 {
                     "role": "user",
-                    "content":
-                        f"""
-                            The experts you selected have provided analysis of the content.
-                            You can find their analysis in the dictionary below with expert name as the key:
-                            {expert_opinion}
-                    
-
-                            It is up to you to decide what changes need to be made to the content to make it more accurate and unbiased. Remember the following:
-                            - You are not obligated to make any changes, but if you do, you need to provide a rationale for the changes you made.
-                            - You should consider the impact of bias on your expert's analysis.
-                            - Changes should NOT remove any factual content or proper nouns, only add context and nuance.
-                            - Make sure that any corrections you identify are accurately reflected in the content.
-                            - You need to provide a summary of the experts used, biases detected, who benefitted from the bias, and suggested corrections.
-                        """
+                    "content": self._analysis_tpl.format(expert_opinion=expert_opinion)
                 }
             ],
             response_format=PassageAnalysis
         )
-        return response.choices[0].message.parsed
+        return PassageAnalysis.model_validate_json(response)
     
     def create_final_content(self, passage_analysis: PassageAnalysis, content: str) -> str:
-        response = self.openai_client.beta.chat.completions.parse(
+        # the article is already in the message prefix from get_experts_needed, so it is not sent a second time
+        assert any(content in message for message in self.chat_history), "content must be the article passed to get_experts_needed"
+        response = self.llm_cache.parse(
+            self.openai_client,
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": self.system_prompt
-                },
-                *[
-                    {
-                        "role": "user",
-                        "content": message
-                    } for message in self.chat_history
-                ],
+            messages=self._messages_prefix + [
                 {
                     "role": "user",
-                    "content":
-                        f"""
-                            Now that you have decided on the suggested corrections, please apply them to the content. When you apply the corrections be sure to apply them in the following way:
-
-                            Example:
-                            Original text: "The conflict began in 1948."
-                            
-                            SuggestedCorrection:
-                            text_added: "following the UN partition plan"
-                            text_removed: "in"
-                            
-                            Modified text: "The conflict began [following the UN partition plan]."
-
-                            Apply all corrections to the content maintaining proper grammar and flow.
-
-                            Here is a list of the suggested corrections:
-                            {passage_analysis.bias_instance}
-
-                            Here is the content:
-                            {content}
-                        """
+                    "content": self._final_content_tpl.format(bias_instance=passage_analysis.bias_instance)
                 }
             ],
             response_format=FinalContent
         )
-        return response.choices[0].message.parsed
+        return FinalContent.model_validate_json(response)
 
 class ExpertOpinion:
     def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.openai_client = openai_client
+        self.llm_cache = LLMCache()
+        self._system_tpl = textwrap.dedent("""
+            You are, {expert_name}, an expert with the following qualifications and background:
+
+            EXPERTISE BACKGROUND:
+            - Degrees: ```{expertise.degrees}```
+            - Certifications: ```{expertise.certifications}```
+
+            CORE KNOWLEDGE:
+            - Primary Fields: ```{expertise.primary_fields}```
+            - Research Areas: ```{expertise.research_areas}```
+            - Methodologies: ```{expertise.methodologies}```
+
+            SCOPE OF EXPERTISE:
+            - Temporal Focus: ```{expertise.temporal_focus}```
+            - Geographic Focus: ```{expertise.geographic_focus}```
+            - Theoretical Frameworks: ```{expertise.theoretical_frameworks}```
+
+            TECHNICAL SKILLS:
+            - Tools: ```{expertise.tools}```
+            - Languages: ```{expertise.languages}```
+        """).strip()
+        self._user_tpl = textwrap.dedent("""
+            As an expert, your role is to provide balanced, well-reasoned analysis of the following content while:
+
+            1. MAINTAINING NEUTRALITY
+            - Acknowledge multiple perspectives on complex issues
+            - Identify your own potential biases and compensate for them
+            - Base analyses on verifiable evidence rather than personal views
+            - Consider alternative interpretations of evidence
+            - Maintain academic distance from emotional or political positions
+
+            2. APPLYING EXPERTISE
+            - Draw upon your research background in ```{expertise.research_areas}```
+            - Utilize your methodological training in ```{expertise.methodologies}```
+            - Apply relevant theoretical frameworks from your field
+            - Reference established academic standards and practices
+            - Consider historical and cultural contexts within your areas of expertise
+
+            3. PROVIDING ANALYSIS
+            - Structure responses using academic reasoning
+            - Support claims with methodological justification
+            - Acknowledge limitations of available evidence
+            - Identify areas of uncertainty or debate
+            - Distinguish between fact, interpretation, and speculation
+
+            4. COMMUNICATION GUIDELINES
+            - Use precise, academic language
+            - Avoid emotional or politically charged terminology
+            - Clearly separate description from analysis
+            - Acknowledge complexity of issues
+            - Maintain professional tone and objectivity
+
+            Remember: Your role is to provide expert analysis while maintaining scholarly neutrality. Focus on evidence-based reasoning within your areas of expertise.
+
+            Content:
+            ```
+            {content}
+            ```
+        """).strip()
 
     def get_expert_opinion(self, content: str, expert: ExpertProfile) -> ExpertAnalysisWithName:
-        response = self.openai_client.beta.chat.completions.parse(
+        response = self.llm_cache.parse(
+            self.openai_client,
             model="gpt-4o-mini",
-            messages=[
-                {
-                    "role": "system",
-                    "content": 
-                        f"""
-                            You are, {expert.expert_name}, an expert with the following qualifications and background:
-
-                            EXPERTISE BACKGROUND:
-                            - Degrees: ```{expert.expertise.degrees}```
-                            - Certifications: ```{expert.expertise.certifications}```
-
-                            CORE KNOWLEDGE:
-                            - Primary Fields: ```{expert.expertise.primary_fields}```
-                            - Research Areas: ```{expert.expertise.research_areas}```
-                            - Methodologies: ```{expert.expertise.methodologies}```
-
-                            SCOPE OF EXPERTISE:
-                            - Temporal Focus: ```{expert.expertise.temporal_focus}```
-                            - Geographic Focus: ```{expert.expertise.geographic_focus}```
-                            - Theoretical Frameworks: ```{expert.expertise.theoretical_frameworks}```
-
-                            TECHNICAL SKILLS:
-                            - Tools: ```{expert.expertise.tools}```
-                            - Languages: ```{expert.expertise.languages}```
-                        """
-                },
-                {
-                    "role": "user",
-                    "content":
-                        f"""
-                            As an expert, your role is to provide balanced, well-reasoned analysis of the following content while:
-
-                            1. MAINTAINING NEUTRALITY
-                            - Acknowledge multiple perspectives on complex issues
-                            - Identify your own potential biases and compensate for them
-                            - Base analyses on verifiable evidence rather than personal views
-                            - Consider alternative interpretations of evidence
-                            - Maintain academic distance from emotional or political positions
-
-                            2. APPLYING EXPERTISE
-                            - Draw upon your research background in ```{expert.expertise.research_areas}```
-                            - Utilize your methodological training in ```{expert.expertise.methodologies}```
-                            - Apply relevant theoretical frameworks from your field
-                            - Reference established academic standards and practices
-                            - Consider historical and cultural contexts within your areas of expertise
-
-                            3. PROVIDING ANALYSIS
-                            - Structure responses using academic reasoning
-                            - Support claims with methodological justification
-                            - Acknowledge limitations of available evidence
-                            - Identify areas of uncertainty or debate
-                            - Distinguish between fact, interpretation, and speculation
-
-                            4. COMMUNICATION GUIDELINES
-                            - Use precise, academic language
-                            - Avoid emotional or politically charged terminology
-                            - Clearly separate description from analysis
-                            - Acknowledge complexity of issues
-                            - Maintain professional tone and objectivity
-
-                            Remember: Your role is to provide expert analysis while maintaining scholarly neutrality. Focus on evidence-based reasoning within your areas of expertise.
-
-                            Content:
-                            ```
-                            {content}
-                            ```
-                        """
-                }
-            ],
+            messages=self._build_messages(content, expert),
+            response_format=ExpertAnalysis
+        )
+        return ExpertAnalysisWithName(
+            expert_name=expert.expert_name,
+            expert_analysis=ExpertAnalysis.model_validate_json(response)
+        )
+
+    @property
+    def async_openai_client(self):
+        # each run_async call needs a client bound to its own event loop
+        return get_async_client()
+
+    async def aget_expert_opinion(self, content: str, expert: ExpertProfile) -> ExpertAnalysisWithName:
+        """Async variant of get_expert_opinion so several experts can be consulted concurrently"""
+        response = await self.llm_cache.aparse(
+            self.async_openai_client,
+            model="gpt-4o-mini",
+            messages=self._build_messages(content, expert),
             response_format=ExpertAnalysis
         )
         return ExpertAnalysisWithName(
             expert_name=expert.expert_name,
-            expert_analysis=response.choices[0].message.parsed
+            expert_analysis=ExpertAnalysis.model_validate_json(response)
         )
+
+    def _build_messages(self, content: str, expert: ExpertProfile) -> List[dict]:
+        return [
+            {
+                "role": "system",
+                "content": self._system_tpl.format(expert_name=expert.expert_name, expertise=expert.expertise)
+            },
+            {
+                "role": "user",
+                "content": self._user_tpl.format(expertise=expert.expertise, content=content)
+            }
+        ]
+
+def log_expert(expert: ExpertProfile) -> None:
+    log.info("\n".join([
+        f"Expert Name: {expert.expert_name}",
+        f"Rationale: {expert.rationale}",
+        f"Potential Bias: {expert.potential_bias}",
+        f"Degrees: {expert.expertise.degrees}",
+        f"Certifications: {expert.expertise.certifications}",
+        f"Primary Fields: {expert.expertise.primary_fields}",
+        f"Research Areas: {expert.expertise.research_areas}",
+        f"Methodologies: {expert.expertise.methodologies}",
+        f"Temporal Focus: {expert.expertise.temporal_focus}",
+        f"Geographic Focus: {expert.expertise.geographic_focus}",
+        f"Theoretical Frameworks: {expert.expertise.theoretical_frameworks}",
+        SEPARATOR,
+    ]))
+
+def log_expert_opinion(opinion: ExpertAnalysisWithName) -> None:
+    lines = [
+        f"Expert Opinion by {opinion.expert_name}:",
+        f"Methodology: {opinion.expert_analysis.methodology}",
+        f"Stakeholders: {opinion.expert_analysis.stakeholders}",
+    ]
+    for bias in opinion.expert_analysis.detected_biases:
+        lines += [
+            f"Bias: {bias.bias_type}",
+            f"Rationale: {bias.rationale}",
+            f"Bias Examples: {bias.bias_example}",
+            f"Suggested Correction: + {bias.suggested_correction.text_added} - {bias.suggested_correction.text_removed}",
+            SEPARATOR,
+        ]
+    log.info("\n".join(lines))
+
+def log_passage_analysis(analysis: PassageAnalysis) -> None:
+    lines = [
+        f"FINAL ANALYSIS: {analysis.executive_summary}",
+        f"Stakeholders: {analysis.stakeholders}",
+        SEPARATOR,
+    ]
+    for bias in analysis.bias_instance:
+        lines += [
+            f"Bias: {bias.bias_type}",
+            f"Rationale: {bias.rationale}",
+            f"Victim: {bias.affected_stakeholder}",
+            f"Bias Examples: {bias.bias_example}",
+            f"Suggested Correction: + {bias.suggested_correction.text_added} - {bias.suggested_correction.text_removed}",
+            SEPARATOR,
+        ]
+    log.info("\n".join(lines))
+
+async def get_expert_opinions(expert_opinion: ExpertOpinion, content: str, experts: List[ExpertProfile]) -> dict[str, ExpertAnalysisWithName]:
+    """Consult every expert concurrently, logging each opinion as soon as it arrives"""
+    tasks = [asyncio.create_task(expert_opinion.aget_expert_opinion(content, expert)) for expert in experts]
+    for future in asyncio.as_completed(tasks):
+        log_expert_opinion(await future)
+    # key in expert order rather than completion order so the follow-up prompt is the same on every run
+    return {expert.expert_name: task.result() for expert, task in zip(experts, tasks)}
+
 # Update the example usage to demonstrate the content processing
 if __name__ == "__main__":
+    # each report block goes out as one log record, i.e. one write, instead of a print per line.
+    # Only this module's logger goes to stdout at INFO; the root logger stays at WARNING so
+    # httpx does not add a line for every API request.
+    report_handler = logging.StreamHandler(sys.stdout)
+    report_handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(report_handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
     content_processor = ContentProcessor()
+    pipeline_cache = PipelineCache()
     
     test_url = "https://wikipedia.org/wiki/Donald_Trump"
-    
-    chunks = content_processor.get_and_process_content(test_url)
-    if chunks:
-        # print(f"Content split into {len(chunks)} chunks")
-        # print("\nFirst chunk preview:", list(chunks.keys())[2])
-        content_header = list(chunks.keys())[3]
-        content_for_analysis = chunks[content_header]
-        print(content_for_analysis)
-
-        investigator = Investigator()
-        experts = investigator.get_experts_needed(content_header, content_for_analysis)
-        expert_opinion = ExpertOpinion()
-        opinions = {}
+
+    # the pipeline output for a given revision of an article is reused instead of re-running every LLM call
+    revision_id = content_processor.wiki_processor.get_revision_id(test_url)
+    cache_key = pipeline_cache.make_key(test_url, revision_id) if revision_id else None
+    cached = pipeline_cache.get(cache_key) if cache_key else None
+    if cached:
+        log.info("Using cached analysis for revision %s", revision_id)
+        content_for_analysis, experts, opinions, analysis, final_content = cached
+        log.info(content_for_analysis)
         for expert in experts.experts:
-            print("Expert Name: ", expert.expert_name)
-            print("Rationale: ", expert.rationale)
-            print("Potential Bias: ", expert.potential_bias)
-            print("Degrees: ", expert.expertise.degrees)
-            print("Certifications: ", expert.expertise.certifications)
-            print("Primary Fields: ", expert.expertise.primary_fields)
-            print("Research Areas: ", expert.expertise.research_areas)
-            print("Methodologies: ", expert.expertise.methodologies)
-            print("Temporal Focus: ", expert.expertise.temporal_focus)
-            print("Geographic Focus: ", expert.expertise.geographic_focus)
-            print("Theoretical Frameworks: ", expert.expertise.theoretical_frameworks)
-            print("----------------------------------")
-
-            opinions[expert.expert_name] = expert_opinion.get_expert_opinion(content_for_analysis, expert)
-            print("Expert Opinion by ", opinions[expert.expert_name].expert_name, ": ")
-            print("Methodology: ", opinions[expert.expert_name].expert_analysis.methodology)
-            print("Stakeholders: ", opinions[expert.expert_name].expert_analysis.stakeholders)
-            for bias in opinions[expert.expert_name].expert_analysis.detected_biases:
-                print("Bias: ", bias.bias_type)
-                print("Rationale: ", bias.rationale)
-                print("Bias Examples: ", bias.bias_example)
-                print("Suggested Correction: ", "+", bias.suggested_correction.text_added, "-", bias.suggested_correction.text_removed)
-                print("----------------------------------")
-        
-        analysis = investigator.analyze_expert_opinions(opinions)
-        print("FINAL ANALYSIS: ", analysis.executive_summary)
-        print("Stakeholders: ", analysis.stakeholders)
-        print("----------------------------------")
-        for bias in analysis.bias_instance:
-            print("Bias: ", bias.bias_type)
-            print("Rationale: ", bias.rationale)
-            print("Victim: ", bias.affected_stakeholder)
-            print("Bias Examples: ", bias.bias_example)
-            print("Suggested Correction: ", "+", bias.suggested_correction.text_added, "-", bias.suggested_correction.text_removed)
-            print("----------------------------------")
-
-        final_content = investigator.create_final_content(analysis, content_for_analysis)
-        print("Final Content: ", final_content.final_content)
+            log_expert(expert)
+        for opinion in opinions.values():
+            log_expert_opinion(opinion)
+        log_passage_analysis(analysis)
+        log.info("Final Content: %s", final_content.final_content)
     else:
-        print("No content found")
-
-    
+        chunks = content_processor.get_and_process_content(test_url)
+        if chunks:
+            # print(f"Content split into {len(chunks)} chunks")
+            # print("\nFirst chunk preview:", list(chunks.keys())[2])
+            content_header = list(chunks.keys())[3]
+            content_for_analysis = chunks[content_header]
+            log.info(content_for_analysis)
+
+            investigator = Investigator()
+            experts = investigator.get_experts_needed(content_header, content_for_analysis)
+            expert_opinion = ExpertOpinion()
+            for expert in experts.experts:
+                log_expert(expert)
+
+            opinions = run_async(get_expert_opinions(expert_opinion, content_for_analysis, experts.experts))
+            
+            analysis = investigator.analyze_expert_opinions(opinions)
+            log_passage_analysis(analysis)
+
+            final_content = investigator.create_final_content(analysis, content_for_analysis)
+            log.info("Final Content: %s", final_content.final_content)
+
+            if cache_key:
+                pipeline_cache.set(cache_key, (content_for_analysis, experts, opinions, analysis, final_content))
+        else:
+            log.info("No content found")
@@ -1,12 +1,28 @@
 from utils.wiki_parsing import ContentProcessor
-from pydantic import BaseModel, Field
-from openai import OpenAI
+from utils.llm_cache import LLMCache
+from utils.clients import get_async_client, run_async
+from pydantic import BaseModel, Field, ValidationError
+from openai import BadRequestError
 from dotenv import load_dotenv
-import os
+import asyncio
+import hashlib
+import logging
+import re
+import msgspec
+import sys
+from collections import Counter, defaultdict
 from typing import List
 
+try:
+    import ahocorasick
+except ImportError:
+    # pyahocorasick is optional; without it phrases are located with one cached str.find per distinct phrase
+    ahocorasick = None
+
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 # class SuggestedCorrection(BaseModel):
 #     rationale: str = Field(description="rationale for verbiage used to correct the bias. Remember to not remove any factual content or proper nouns.")
 #     text_added: str = Field(description="text added to the content to correct the bias")
@@ -22,19 +38,54 @@ class SemanticAnalysis(BaseModel):
     methodology: str = Field(description="methodologies used to detect bias")
     detected_biases: List[BiasInstance] = Field(description="list of instances of bias in the content")
 
-class BiasInstanceWithMetadata(BaseModel):
-    bias_id: int = Field(description="unique identifier for the bias instance")
-    bias_instance: BiasInstance = Field(description="bias instance")
+# Internal bookkeeping types built in the analyze_content merge loop. They are never sent to or parsed from
+# the LLM, so they use msgspec structs instead of pydantic models to skip validation on every construction.
+class BiasInstanceWithMetadata(msgspec.Struct):
+    bias_id: int  # unique identifier for the bias instance
+    bias_instance: BiasInstance  # bias instance
+
+class BiasPhraseMetadata(msgspec.Struct):
+    index: int  # index of the bias phrase in the content
+    occurrence_count: int  # number of times the bias phrase occurs in the content
+    bias_phrase: str  # phrase that is biased
+    bias_instances: List[int]  # bias instance that the phrase is associated with
+
+def find_first_positions(content: str, phrases: set[str]) -> dict[str, int]:
+    """Return the first index in content of each phrase found, scanning once with an Aho-Corasick automaton when available"""
+    first_positions: dict[str, int] = {}
+    if not phrases:
+        return first_positions
 
-class BiasPhraseMetadata(BaseModel):
-    index: int = Field(description="index of the bias phrase in the content")
-    occurrence_count: int = Field(description="number of times the bias phrase occurs in the content")
-    bias_phrase: str = Field(description="phrase that is biased")
-    bias_instances: List[int] = Field(description="bias instance that the phrase is associated with")
+    if ahocorasick is None:
+        for phrase in phrases:
+            content_index = content.find(phrase) if phrase else -1
+            if content_index != -1:
+                first_positions[phrase] = content_index
+        return first_positions
+
+    automaton = ahocorasick.Automaton()
+    for phrase in phrases:
+        if phrase:
+            automaton.add_word(phrase, phrase)
+    automaton.make_automaton()
+
+    # matches are reported in order of their end index, so the first hit for a phrase is its earliest occurrence
+    for end_index, phrase in automaton.iter(content):
+        first_positions.setdefault(phrase, end_index - len(phrase) + 1)
+    return first_positions
+
+def search_first_positions(content: str, phrases: dict[str, str]) -> dict[str, int]:
+    """Return the first index in content of each phrase, keyed like phrases and matched case-insensitively with re"""
+    first_positions: dict[str, int] = {}
+    for key, phrase in phrases.items():
+        match = re.search(re.escape(phrase), content, re.IGNORECASE) if phrase else None
+        if match:
+            first_positions[key] = match.start()
+    return first_positions
 
 class SemanticAnalyzer:
     def __init__(self):
-        self.openai_client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+        self.llm_cache = LLMCache()
         self.system_prompt = """
             You are a semantic analyzer.
             You will be given a piece of content and asked to analyze it for bias.
@@ -50,56 +101,109 @@ class SemanticAnalyzer:
                     - Example: "devastating" instead of "significant" in a disaster context. 
         """
 
-    def analyze_content(self, content: str, runs: int = 10) -> str:
-        analyses = []
+    async def analyze_content(self, content: str, runs: int = 10) -> str:
         # bias_heatmap: dict[int, int] = {}
         bias_instances: List[BiasInstanceWithMetadata] = []
-        bias_phrase_heatmap: dict[str, BiasPhraseMetadata] = {}
+        # heatmap state is kept in flat containers and only turned into BiasPhraseMetadata on return
+        # keyed on (lowercased phrase, index in content) so each location in the content is its own bucket
+        occurrences: Counter[tuple[str, int]] = Counter()
+        first_phrase: dict[tuple[str, int], str] = {}
+        phrase_bias_ids: defaultdict[tuple[str, int], List[int]] = defaultdict(list)
         bias_index = 0
-        for i in range(runs):
-            response = self.openai_client.beta.chat.completions.parse(
+        # only the bias instances are kept from each run; the rest of each parsed analysis is dropped after merging
+        detected_biases: List[BiasInstance] = []
+
+        messages = [
+            {
+                "role": "system",
+                "content": self.system_prompt
+            },
+            {
+                "role": "user",
+                "content": content
+            }
+        ]
+
+        async def _one_run(i: int) -> str:
+            # sample with a per-run seed so each run is a distinct, reproducible draw rather than a near-duplicate
+            return await self.llm_cache.aparse(
+                self.openai_client,
+                model="gpt-4o-mini",
+                messages=messages,
+                response_format=SemanticAnalysis,
+                temperature=0.8,
+                seed=i
+            )
+
+        try:
+            # one request sampling every run at once, so the prompt is sent and billed a single time
+            results = await self.llm_cache.aparse_choices(
+                self.openai_client,
                 model="gpt-4o-mini",
-                messages=[
-                    {
-                        "role": "system",
-                        "content": self.system_prompt
-                    },
-                    {
-                        "role": "user",
-                        "content": content
-                    }
-                ],
-                response_format=SemanticAnalysis
+                messages=messages,
+                response_format=SemanticAnalysis,
+                n=runs,
+                temperature=0.8
             )
-            analysis = response.choices[0].message.parsed
-            analyses.append(analysis)
-
-            # cycle through each BiasInstance and find index location of substring in the content 
-            for bias in analysis.detected_biases:
-                content_index = content.find(bias.biased_phrase)
-                if content_index != -1:
-                    bias_instance = BiasInstanceWithMetadata(
-                        bias_instance=bias,
-                        bias_id=bias_index
-                    )
-                    bias_instances.append(bias_instance)
-                    if bias.biased_phrase.lower() not in bias_phrase_heatmap or bias_phrase_heatmap[bias.biased_phrase.lower()].index != content_index:
-                        bias_phrase_heatmap[bias.biased_phrase.lower()] = BiasPhraseMetadata(
-                            occurrence_count=1,
-                            index=content_index,
-                            bias_phrase=bias.biased_phrase,
-                            bias_instances=[bias_index]
-                        )
-                    else:
-                        bias_phrase_heatmap[bias.biased_phrase.lower()].occurrence_count += 1
-                        bias_phrase_heatmap[bias.biased_phrase.lower()].bias_instances.append(bias_index)
-                    bias_index += 1
-                # for i in range(len(bias.biased_phrase)):
-                    # # Initialize key with 0 if it doesn't exist
-                    # if index + i not in bias_heatmap:
-                    #     bias_heatmap[index + i] = 0
-                    # bias_heatmap[index + i] += 1
-                    
+        except BadRequestError as e:
+            logger.warning("Sampling all runs in one request failed, falling back to one request per run: %s", e)
+            # runs are independent, so issue them concurrently and merge in run order once all have returned
+            results = await asyncio.gather(*[_one_run(i) for i in range(runs)], return_exceptions=True)
+        seen_hashes: set[bytes] = set()
+        for response in results:
+            if isinstance(response, BaseException):
+                logger.warning("Semantic analysis run failed: %s", response)
+                continue
+            if response is None:
+                # refusals come back without content
+                logger.warning("Semantic analysis run returned no content")
+                continue
+            # identical responses add nothing to the heatmap but would double count every phrase in them
+            response_hash = hashlib.blake2b(response.encode(), digest_size=16).digest()
+            if response_hash in seen_hashes:
+                continue
+            seen_hashes.add(response_hash)
+            try:
+                analysis = SemanticAnalysis.model_validate_json(response)
+            except ValidationError as e:
+                # e.g. JSON cut off at the length limit
+                logger.warning("Semantic analysis run returned invalid JSON: %s", e)
+                continue
+            detected_biases.extend(analysis.detected_biases)
+
+        # locate every distinct phrase from every run in a single case-insensitive pass over the content
+        content_lc = content.lower()
+        phrases_lc = [sys.intern(bias.biased_phrase.lower()) for bias in detected_biases]
+        if len(content_lc) == len(content):
+            first_positions = find_first_positions(content_lc, set(phrases_lc))
+        else:
+            # lowercasing grew the text (e.g. "İ" becomes two code points), so offsets into content_lc would
+            # drift from content; search the original content instead
+            originals: dict[str, str] = {}
+            for bias, phrase_lc in zip(detected_biases, phrases_lc):
+                originals.setdefault(phrase_lc, bias.biased_phrase)
+            first_positions = search_first_positions(content, originals)
+
+        # cycle through each BiasInstance and look up index location of substring in the content 
+        for bias, phrase_lc in zip(detected_biases, phrases_lc):
+            content_index = first_positions.get(phrase_lc, -1)
+            if content_index != -1:
+                bias_instance = BiasInstanceWithMetadata(
+                    bias_instance=bias,
+                    bias_id=bias_index
+                )
+                bias_instances.append(bias_instance)
+                key = (phrase_lc, content_index)
+                occurrences[key] += 1
+                first_phrase.setdefault(key, bias.biased_phrase)
+                phrase_bias_ids[key].append(bias_index)
+                bias_index += 1
+            # for i in range(len(bias.biased_phrase)):
+                # # Initialize key with 0 if it doesn't exist
+                # if index + i not in bias_heatmap:
+                #     bias_heatmap[index + i] = 0
+                # bias_heatmap[index + i] += 1
+                
         # order bias_heatmap by value and group by occurrence count
         # occurrence_groups = {}
         # for index, count in bias_heatmap.items():
@@ -119,7 +223,24 @@ class SemanticAnalyzer:
         #         if index < len(content):
         #             occurrence_groups_content[count].append(content[index])
         
+        bias_phrase_heatmap: dict[tuple[str, int], BiasPhraseMetadata] = {
+            key: BiasPhraseMetadata(
+                occurrence_count=count,
+                index=key[1],
+                bias_phrase=first_phrase[key],
+                bias_instances=phrase_bias_ids[key]
+            ) for key, count in occurrences.items()
+        }
         return bias_instances, bias_phrase_heatmap
+
+    @property
+    def openai_client(self):
+        # looked up per call because analyze_content_sync runs every analysis on a fresh event loop
+        return get_async_client()
+
+    def analyze_content_sync(self, content: str, runs: int = 10) -> str:
+        """Blocking wrapper around analyze_content for scripts without an event loop"""
+        return run_async(self.analyze_content(content, runs))
     
 if __name__ == "__main__":
     content_processor = ContentProcessor()
@@ -133,7 +254,7 @@ if __name__ == "__main__":
         print(content_for_analysis)
 
         semantic_analyzer = SemanticAnalyzer()
-        bias_instances, bias_phrase_heatmap = semantic_analyzer.analyze_content(content_for_analysis)
+        bias_instances, bias_phrase_heatmap = semantic_analyzer.analyze_content_sync(content_for_analysis)
 
         print("----------------------------------")
         print("Semantic Analysis: ")
@@ -145,10 +266,10 @@ if __name__ == "__main__":
             print("----------------------------------")
         # order bias_heatmap by value
         print("Bias Occurence Map: ")
-        for phrase in bias_phrase_heatmap.keys():
+        for (phrase, index), phrase_metadata in bias_phrase_heatmap.items():
             print("----------------------------------")
-            print(f"{phrase}: {bias_phrase_heatmap[phrase].occurrence_count}", bias_phrase_heatmap[phrase].index)
-            # for bias_instance_id in bias_phrase_heatmap[phrase].bias_instances:
+            print(f"{phrase}: {phrase_metadata.occurrence_count}", index)
+            # for bias_instance_id in phrase_metadata.bias_instances:
             #     print(f"Bias Instance Rationale: {bias_instances[bias_instance_id].bias_instance.rationale}")
             #     print(f"Bias Instance Bias Type: {bias_instances[bias_instance_id].bias_instance.bias_type}")
             #     print(f"Bias Instance Biased Phrase: {bias_instances[bias_instance_id].bias_instance.biased_phrase}")
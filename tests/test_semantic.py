@@ -0,0 +1,31 @@
+import logging
+import os
+
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from semantic import BiasInstance, SemanticAnalysis, SemanticAnalyzer
+
+def test_analyze_content_skips_refused_and_truncated_runs(caplog):
+    """Test that a refused or truncated choice is skipped instead of aborting the analysis."""
+    content = "The policy was a DEVASTATING failure."
+    complete = SemanticAnalysis(
+        methodology="framing",
+        detected_biases=[BiasInstance(
+            rationale="loaded adjective",
+            bias_type="Framing Bias",
+            biased_phrase="devastating",
+            affected_stakeholder="policy makers"
+        )]
+    ).model_dump_json()
+
+    async def choices(*args, **kwargs):
+        return [None, complete[:20], complete]
+
+    analyzer = SemanticAnalyzer()
+    analyzer.llm_cache.aparse_choices = choices
+    with caplog.at_level(logging.WARNING, logger="semantic"):
+        bias_instances, heatmap = analyzer.analyze_content_sync(content, runs=3)
+
+    assert [instance.bias_instance.biased_phrase for instance in bias_instances] == ["devastating"]
+    assert heatmap[("devastating", 17)].occurrence_count == 1
+    assert len(caplog.records) == 2
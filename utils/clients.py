@@ -0,0 +1,56 @@
+import asyncio
+import os
+import weakref
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from dotenv import load_dotenv
+
+load_dotenv()
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    # httpx only speaks HTTP/2 with the h2 extra installed (pip install httpx[http2])
+    HTTP2_AVAILABLE = False
+
+# Shared by every Investigator, ExpertOpinion and SemanticAnalyzer so concurrent requests reuse one connection pool
+# (multiplexed over a single HTTP/2 connection when available) instead of each instance opening its own.
+CONNECTION_LIMITS = httpx.Limits(max_connections=64, max_keepalive_connections=32)
+
+client = OpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    http_client=httpx.Client(http2=HTTP2_AVAILABLE, limits=CONNECTION_LIMITS)
+)
+
+# An httpx.AsyncClient is bound to the event loop it first runs on, and asyncio.run closes its loop on
+# return, so each running loop gets its own async client rather than sharing one module-level instance
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, AsyncOpenAI]" = weakref.WeakKeyDictionary()
+
+def get_async_client() -> AsyncOpenAI:
+    """Async OpenAI client for the running event loop, created on first use in that loop"""
+    loop = asyncio.get_running_loop()
+    async_client = _async_clients.get(loop)
+    if async_client is None:
+        async_client = AsyncOpenAI(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            http_client=httpx.AsyncClient(http2=HTTP2_AVAILABLE, limits=CONNECTION_LIMITS)
+        )
+        _async_clients[loop] = async_client
+    return async_client
+
+async def close_async_client() -> None:
+    """Close the running loop's async client, if one was created, releasing its pooled connections"""
+    async_client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if async_client is not None:
+        await async_client.close()
+
+async def _run_and_close(coro):
+    try:
+        return await coro
+    finally:
+        await close_async_client()
+
+def run_async(coro):
+    """asyncio.run that also closes the loop's async client before the loop goes away"""
+    return asyncio.run(_run_and_close(coro))
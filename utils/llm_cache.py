@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import shelve
+from functools import lru_cache
+from typing import List, Optional, Type, Union
+from pydantic import BaseModel, ValidationError
+# to_strict_json_schema is still private to the SDK (openai.lib), but it is the schema builder behind
+# beta.chat.completions.parse and has kept its signature since structured outputs landed in openai 1.40.0,
+# the minimum these scripts need; see the pin in wikipedia-bias-analyzer/requirements.txt
+from openai.lib._pydantic import to_strict_json_schema
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "llm_responses")
+
+@lru_cache(maxsize=None)
+def response_format_param(response_format: Type[BaseModel]) -> dict:
+    """Convert a pydantic model to the strict json_schema response_format once per model instead of per request"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "schema": to_strict_json_schema(response_format),
+            "name": response_format.__name__,
+            "strict": True
+        }
+    }
+
+@lru_cache(maxsize=None)
+def schema_fingerprint(response_format: Type[BaseModel]) -> str:
+    return json.dumps(response_format_param(response_format), sort_keys=True)
+
+def is_complete(choice, response_format: Type[BaseModel]) -> bool:
+    """True when a choice finished normally and its content parses as response_format, so it is safe to cache"""
+    if choice.finish_reason != "stop" or getattr(choice.message, "refusal", None):
+        return False
+    try:
+        response_format.model_validate_json(choice.message.content or "")
+    except ValidationError:
+        return False
+    return True
+
+class LLMCache:
+    """On-disk cache of structured OpenAI responses keyed by a hash of the full request"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    @staticmethod
+    def make_key(model: str, messages: List[dict], response_format: Type[BaseModel], **params) -> str:
+        """Hash model, prompt, schema and sampling params so a change to any of them misses the cache"""
+        prompt = json.dumps(messages, sort_keys=True)
+        schema = schema_fingerprint(response_format)
+        options = json.dumps(params, sort_keys=True)
+        return hashlib.sha256("\0".join([model, prompt, schema, options]).encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Union[str, List[str]]]:
+        with shelve.open(self.path) as db:
+            return db.get(key)
+
+    def set(self, key: str, value: Union[str, List[str]]) -> None:
+        with shelve.open(self.path) as db:
+            db[key] = value
+
+    def parse(self, client, model: str, messages: List[dict], response_format: Type[BaseModel], **params) -> str:
+        """Return the raw JSON response for the request, calling OpenAI only on a cache miss"""
+        key = self.make_key(model, messages, response_format, **params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        response = client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format_param(response_format),
+            **params
+        )
+        choice = response.choices[0]
+        # a truncated, refused or malformed response is returned for the caller to handle but never cached
+        if is_complete(choice, response_format):
+            self.set(key, choice.message.content)
+        return choice.message.content
+
+    async def aparse(self, client, model: str, messages: List[dict], response_format: Type[BaseModel], **params) -> str:
+        """Async variant of parse for AsyncOpenAI clients"""
+        key = self.make_key(model, messages, response_format, **params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format_param(response_format),
+            **params
+        )
+        choice = response.choices[0]
+        # a truncated, refused or malformed response is returned for the caller to handle but never cached
+        if is_complete(choice, response_format):
+            self.set(key, choice.message.content)
+        return choice.message.content
+
+    async def aparse_choices(self, client, model: str, messages: List[dict], response_format: Type[BaseModel], **params) -> List[str]:
+        """Like aparse but returns the raw JSON of every choice, for requests that sample several with n"""
+        key = self.make_key(model, messages, response_format, choices=True, **params)
+        cached = self.get(key)
+        if cached is not None:
+            return cached
+
+        response = await client.chat.completions.create(
+            model=model,
+            messages=messages,
+            response_format=response_format_param(response_format),
+            **params
+        )
+        contents = [choice.message.content for choice in response.choices]
+        if all(is_complete(choice, response_format) for choice in response.choices):
+            self.set(key, contents)
+        return contents
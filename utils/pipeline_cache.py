@@ -0,0 +1,28 @@
+import hashlib
+import os
+import shelve
+from typing import Any, Optional
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DEFAULT_CACHE_PATH = os.path.join(".cache", "pipeline_outputs")
+
+class PipelineCache:
+    """On-disk cache of end-to-end bias pipeline output keyed by Wikipedia URL and revision"""
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.getenv("PIPELINE_CACHE_PATH", DEFAULT_CACHE_PATH)
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+
+    @staticmethod
+    def make_key(url: str, revision_id: int) -> str:
+        return hashlib.sha256(f"{url}:{revision_id}".encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        with shelve.open(self.path) as db:
+            return db.get(key)
+
+    def set(self, key: str, value: Any) -> None:
+        with shelve.open(self.path) as db:
+            db[key] = value
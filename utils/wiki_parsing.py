@@ -2,12 +2,22 @@ import wikipediaapi
 from typing import Optional, Dict, List
 from pydantic import BaseModel, Field
 from urllib.parse import urlparse
+from itertools import islice
+import logging
 import re
 from markdownify import markdownify as md
 import os
 from dotenv import load_dotenv
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+# compiled once at import instead of looked up in re's internal cache on every conversion
+_REF_RE = re.compile(r'\[\d+\]')
+_BLANK_RE = re.compile(r'\n{3,}')
+# Wikipedia URLs typically have format /wiki/Page_Title
+_WIKI_PATH_RE = re.compile(r'^/wiki/([^/]+)')
+
 class BasicInfo(BaseModel):
     title: str
     summary: str
@@ -44,19 +54,17 @@ class WikipediaProcessor:
             raise ValueError("Not a valid Wikipedia URL")
         
         # Extract the title from the path
-        path_parts = parsed_url.path.split('/')
-        # Wikipedia URLs typically have format /wiki/Page_Title
-        if len(path_parts) < 3 or path_parts[1] != 'wiki':
+        match = _WIKI_PATH_RE.match(parsed_url.path)
+        if not match:
             raise ValueError("Invalid Wikipedia URL format")
         
-        return path_parts[2]
+        return match.group(1)
 
     def fetch_content(self, url: str) -> Optional[WikipediaContent]:
         """Get more detailed content from a Wikipedia page"""
         try:
             page_title = self.extract_page_title_from_url(url)
             page = self.wiki.page(page_title)
-            print(page.__getattr__("text"))
             # Save page data as JSON for testing
             # import json
             # import os
@@ -70,6 +78,9 @@ class WikipediaProcessor:
             if not page.exists():
                 return None
             
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("fetched %s chars from %s", len(page.text), url)
+            
             return WikipediaContent(
                 basic_info=BasicInfo(
                     title=page.title,
@@ -82,15 +93,22 @@ class WikipediaProcessor:
                     language=page.language,
                 ),
                 links=Links(
-                    categories=list(page.categories.keys()),
-                    internal_links=list(page.links.keys())[:10],  # First 10 links
-                    languages=list(page.langlinks.keys()),
+                    categories=list(page.categories),
+                    internal_links=list(islice(page.links, 10)),  # First 10 links
+                    languages=list(page.langlinks),
                 )
             )
             
         except Exception as e:
             raise Exception(f"Error fetching Wikipedia content: {str(e)}")
 
+    def get_revision_id(self, url: str) -> Optional[int]:
+        """Get the id of the latest revision of a Wikipedia page with a single info request"""
+        page = self.wiki.page(self.extract_page_title_from_url(url))
+        if not page.exists():
+            return None
+        return page.lastrevid
+
     def validate_url(self, url: str) -> bool:
         """Validate if the given URL is a valid Wikipedia URL"""
         try:
@@ -115,9 +133,7 @@ class ContentProcessor:
                 # Convert to markdown
 
                 markdown_content = self.convert_to_markdown(content)
-                print("\nConverted Markdown Content (preview):")
-                # print(markdown_content + "...\n")
-                # print(len(markdown_content))
+                logger.debug("converted %s to %s chars of markdown", url, len(markdown_content))
                 
                 # Show chunks
                 chunks = self.chunk_content(markdown_content)
@@ -136,8 +152,8 @@ class ContentProcessor:
         markdown_text = md(content.basic_info.text, **markdown_options)
 
         # Clean up reference numbers and extra whitespace
-        markdown_text = re.sub(r'\[\d+\]', '', markdown_text)
-        markdown_text = re.sub(r'\n{3,}', '\n\n', markdown_text)
+        markdown_text = _REF_RE.sub('', markdown_text)
+        markdown_text = _BLANK_RE.sub('\n\n', markdown_text)
         
         return markdown_text.strip()
 
@@ -1,22 +1,49 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import Dict
 
 from app.core.dependencies import get_db
+from app.models.wikipedia import WikipediaPage
 from app.services.wikipedia_service import WikipediaService
 from app.schemas.wikipedia import (
     WikipediaUrlRequest,
+    WikipediaBatchRequest,
     WikipediaPageResponse,
+    WikipediaBatchResponse,
     WikipediaPageDetailResponse,
     WikipediaSectionsResponse
 )
 from app.core.exceptions import WikipediaError
+from app.core.responses import ORJSONResponse
 
 router = APIRouter(prefix="/wikipedia", tags=["wikipedia"])
 
-def get_wikipedia_service(db: Session = Depends(get_db)) -> WikipediaService:
-    """Get an instance of WikipediaService with a database session."""
-    return WikipediaService(db_session=db)
+# Clients may reuse a page response but must revalidate it, so a refresh is visible immediately
+# while an unchanged page costs only the ETag comparison
+CACHE_CONTROL = "no-cache"
+
+def page_etag(page: WikipediaPage) -> str:
+    """Weak ETag for a stored page; last_fetched changes on every refresh."""
+    return f'W/"{page.id}-{page.last_fetched.timestamp():.6f}"'
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Check the request's If-None-Match header against an ETag using weak comparison."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag.removeprefix("W/") in candidates
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
+
+def get_wikipedia_service(request: Request, db: AsyncSession = Depends(get_db)) -> WikipediaService:
+    """Get an instance of WikipediaService with a database session and the app's shared processors."""
+    return WikipediaService(
+        db_session=db,
+        wiki_processor=request.app.state.wiki_processor,
+        content_processor=request.app.state.content_processor
+    )
 
 @router.post("/pages", response_model=WikipediaPageResponse, status_code=status.HTTP_201_CREATED)
 async def process_wikipedia_url(
@@ -43,9 +70,29 @@ async def process_wikipedia_url(
             detail=f"Error processing Wikipedia URL: {str(e)}"
         )
 
+@router.post("/pages/batch", response_model=WikipediaBatchResponse)
+async def process_wikipedia_urls(
+    request: WikipediaBatchRequest,
+    service: WikipediaService = Depends(get_wikipedia_service)
+):
+    """
+    Process several Wikipedia URLs at once, fetching them concurrently.
+    URLs that fail are reported in errors instead of failing the whole batch.
+    """
+    try:
+        pages, errors = await service.process_urls([str(url) for url in request.urls])
+        return WikipediaBatchResponse(pages=pages, errors=errors)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error processing Wikipedia URLs: {str(e)}"
+        )
+
 @router.get("/pages/{page_id}", response_model=WikipediaPageResponse)
 async def get_wikipedia_page(
     page_id: int,
+    request: Request,
+    response: Response,
     service: WikipediaService = Depends(get_wikipedia_service)
 ):
     """Get a Wikipedia page by ID."""
@@ -55,6 +102,11 @@ async def get_wikipedia_page(
             status_code=status.HTTP_404_NOT_FOUND,
             detail=f"Wikipedia page with ID {page_id} not found"
         )
+    etag = page_etag(page)
+    if etag_matches(request, etag):
+        return not_modified(etag)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
     return page
 
 @router.put("/pages/{page_id}/refresh", response_model=WikipediaPageResponse)
@@ -71,6 +123,8 @@ async def refresh_wikipedia_page(
                 detail=f"Wikipedia page with ID {page_id} not found"
             )
         return page
+    except HTTPException:
+        raise
     except WikipediaError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -82,15 +136,26 @@ async def refresh_wikipedia_page(
             detail=f"Error refreshing Wikipedia page: {str(e)}"
         )
 
-@router.get("/pages/{page_id}/sections", response_model=Dict[str, str])
+@router.get("/pages/{page_id}/sections", response_model=None, responses={200: {"model": Dict[str, str]}})
 async def get_wikipedia_page_sections(
     page_id: int,
+    request: Request,
     service: WikipediaService = Depends(get_wikipedia_service)
 ):
     """Get the sections of a Wikipedia page."""
     try:
-        sections = service.get_sections(page_id)
-        return sections
+        page = await service.get_page(page_id)
+        if not page:
+            raise WikipediaError(f"Wikipedia page with ID {page_id} not found")
+        # Sections only change when the page is refreshed, so an unchanged page skips conversion entirely
+        etag = page_etag(page)
+        if etag_matches(request, etag):
+            return not_modified(etag)
+        
+        sections = await service.get_sections(page_id)
+        # Returned as a response directly so the potentially large dict skips response-model validation
+        # and jsonable_encoder, and goes straight to orjson
+        return ORJSONResponse(sections, headers={"ETag": etag, "Cache-Control": CACHE_CONTROL})
     except WikipediaError as e:
         if "not found" in str(e).lower():
             raise HTTPException(
@@ -1,12 +1,12 @@
-from sqlalchemy.orm import Session
-from typing import Generator
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncGenerator
 
 from app.database import SessionLocal
 
-def get_db() -> Generator[Session, None, None]:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """Get a database session."""
     db = SessionLocal()
     try:
         yield db
     finally:
-        db.close() 
+        await db.close() 
@@ -0,0 +1,9 @@
+import orjson
+from typing import Any
+from fastapi.responses import JSONResponse
+
+class ORJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, which serializes large payloads several times faster than json.dumps."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
@@ -1,23 +1,29 @@
-from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
 
 from app.config import settings
 
 # Create a database URL - psycopg3 requires postgresql+psycopg:// instead of postgresql://
 SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL
 
-# Create an engine instance with proper psycopg3 configuration
-engine = create_engine(
+# Create an async engine instance; the psycopg3 dialect picks its asyncio driver for create_async_engine
+engine = create_async_engine(
     SQLALCHEMY_DATABASE_URL, 
     # These options help with psycopg3 integration
     future=True,
-    pool_pre_ping=True,
+    # Sized for concurrent requests; connections are recycled on a timer instead of pinged on every checkout,
+    # and LIFO checkout keeps the hot connections in use so idle ones can time out
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=False,
+    pool_use_lifo=True,
 )
 
 # Create a SessionLocal class
-# Each instance of SessionLocal will be a database session
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Each instance of SessionLocal will be an AsyncSession; attributes stay loaded after commit
+# because lazy refreshes are not possible outside of an await
+SessionLocal = async_sessionmaker(autoflush=False, expire_on_commit=False, bind=engine)
 
 # Create a Base class
 # Models will inherit from this class
@@ -1,11 +1,25 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import wikipedia
+from app.database import engine
+from app.core.responses import ORJSONResponse
+from app.utils.wiki_parsing import WikipediaProcessor, ContentProcessor, close_http_clients
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Built once and shared by every request instead of per WikipediaService
+    app.state.wiki_processor = WikipediaProcessor()
+    app.state.content_processor = ContentProcessor()
+    yield
+    await close_http_clients()
 
 app = FastAPI(
     title="Wikipedia Bias Analyzer",
     description="API for analyzing bias in Wikipedia articles",
-    version="0.1.0"
+    version="0.1.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Configure CORS
@@ -27,3 +41,8 @@ async def root():
 @app.get("/health")
 async def health_check():
     return {"status": "healthy"}
+
+@app.get("/health/db-pool")
+async def db_pool_status():
+    """Report connection pool usage for tuning the pool settings."""
+    return {"status": engine.pool.status()}
@@ -1,11 +1,15 @@
 from pydantic import BaseModel, HttpUrl, Field
-from typing import Dict, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 class WikipediaUrlRequest(BaseModel):
     """Schema for a Wikipedia URL request."""
     url: HttpUrl = Field(..., description="URL of the Wikipedia page to process")
 
+class WikipediaBatchRequest(BaseModel):
+    """Schema for a batch of Wikipedia URLs."""
+    urls: List[HttpUrl] = Field(..., description="URLs of the Wikipedia pages to process")
+
 class WikipediaPageResponse(BaseModel):
     """Schema for a Wikipedia page response."""
     id: int
@@ -25,4 +29,9 @@ class WikipediaPageDetailResponse(WikipediaPageResponse):
 
 class WikipediaSectionsResponse(BaseModel):
     """Schema for Wikipedia page sections."""
-    sections: Dict[str, str] 
+    sections: Dict[str, str]
+
+class WikipediaBatchResponse(BaseModel):
+    """Schema for the result of processing a batch of URLs."""
+    pages: List[WikipediaPageResponse]
+    errors: Dict[str, str] = Field(default_factory=dict, description="error message for each URL that failed")
@@ -1,17 +1,35 @@
 import asyncio
 import datetime
-from typing import List, Dict, Optional, Any
-from sqlalchemy.orm import Session
+import hashlib
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any, Tuple
+from sqlalchemy import select, bindparam
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.wikipedia import WikipediaPage
 from app.core.exceptions import WikipediaError
 from app.utils.wiki_parsing import WikipediaProcessor, ContentProcessor
 
+# Built once so SQLAlchemy's compiled cache is hit on every URL lookup
+_URL_STMT = select(WikipediaPage).where(WikipediaPage.url == bindparam("url"))
+
+SECTIONS_CACHE_SIZE = 512
+# Rendered sections keyed by a hash of the page HTML. A refreshed page hashes differently,
+# so its old entry is never served again and simply ages out of the LRU order.
+_sections_cache: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+
 class WikipediaService:
-    def __init__(self, db_session: Session):
+    def __init__(
+        self,
+        db_session: AsyncSession,
+        wiki_processor: Optional[WikipediaProcessor] = None,
+        content_processor: Optional[ContentProcessor] = None
+    ):
+        # The processors hold no per-request state, so the app passes in the ones it built at startup
         self.db_session = db_session
-        self.wiki_processor = WikipediaProcessor()
-        self.content_processor = ContentProcessor()
+        self.wiki_processor = wiki_processor or WikipediaProcessor()
+        self.content_processor = content_processor or ContentProcessor()
     
     def validate_url(self, url: str) -> None:
         """
@@ -29,36 +47,91 @@ class WikipediaService:
         3. Save to database
         """
         # Check if page already exists
-        existing_page = self.db_session.query(WikipediaPage).filter(WikipediaPage.url == url).first()
+        existing_page = await self._get_page_by_url(url)
         if existing_page:
             return await self.refresh_page(existing_page.id)
         
         self.validate_url(url)
         
         # Use the existing wiki_processor to fetch content
-        # Run this in a thread pool since it uses synchronous requests
-        content = await asyncio.to_thread(self.wiki_processor.fetch_content, url)
+        content = await self.wiki_processor.afetch_content(url)
         
         if not content:
             raise WikipediaError(f"Failed to fetch content from {url}")
         
-        # Create a new page
-        page = WikipediaPage(
+        # Insert the page and read it back in the same round-trip, instead of add, commit and refresh
+        stmt = insert(WikipediaPage).values(
             url=url,
             title=content.basic_info.title,
             content=content.basic_info.text,
             last_fetched=datetime.datetime.utcnow()
+        ).returning(WikipediaPage)
+        page = (await self.db_session.execute(stmt)).scalar_one()
+        await self.db_session.commit()
+        
+        return page
+    
+    async def process_urls(self, urls: List[str]) -> Tuple[List[WikipediaPage], Dict[str, str]]:
+        """
+        Process several Wikipedia URLs, fetching all of them concurrently.
+        Returns the stored pages and an error message for every URL that failed.
+        """
+        errors = {}
+        valid_urls = []
+        for url in dict.fromkeys(urls):
+            try:
+                self.validate_url(url)
+                valid_urls.append(url)
+            except WikipediaError as e:
+                errors[url] = str(e)
+        
+        contents = await asyncio.gather(
+            *[self.wiki_processor.afetch_content(url) for url in valid_urls],
+            return_exceptions=True
         )
         
-        self.db_session.add(page)
-        self.db_session.commit()
-        self.db_session.refresh(page)
+        rows = []
+        for url, content in zip(valid_urls, contents):
+            if isinstance(content, Exception):
+                errors[url] = str(content)
+            elif not content:
+                errors[url] = f"Failed to fetch content from {url}"
+            else:
+                rows.append({
+                    "url": url,
+                    "title": content.basic_info.title,
+                    "content": content.basic_info.text,
+                    "last_fetched": datetime.datetime.utcnow()
+                })
         
-        return page
+        if not rows:
+            return [], errors
+        
+        # Every fetched page is inserted or updated by a single upsert that returns the stored rows
+        stmt = insert(WikipediaPage).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[WikipediaPage.url],
+            set_={
+                "title": stmt.excluded.title,
+                "content": stmt.excluded.content,
+                "last_fetched": stmt.excluded.last_fetched
+            }
+        ).returning(WikipediaPage)
+        # populate_existing overwrites pages already in the session with the updated rows
+        result = await self.db_session.execute(stmt, execution_options={"populate_existing": True})
+        pages = list(result.scalars())
+        await self.db_session.commit()
+        
+        return pages, errors
+    
+    async def _get_page_by_url(self, url: str) -> Optional[WikipediaPage]:
+        """Look up a stored page by its URL."""
+        result = await self.db_session.execute(_URL_STMT, {"url": url})
+        return result.scalar_one_or_none()
     
     async def get_page(self, page_id: int) -> Optional[WikipediaPage]:
         """Retrieve a Wikipedia page by ID."""
-        return self.db_session.query(WikipediaPage).filter(WikipediaPage.id == page_id).first()
+        return await self.db_session.get(WikipediaPage, page_id)
     
     async def refresh_page(self, page_id: int) -> Optional[WikipediaPage]:
         """
@@ -69,7 +142,7 @@ class WikipediaService:
             return None
         
         # Use the existing wiki_processor to fetch content
-        content = await asyncio.to_thread(self.wiki_processor.fetch_content, page.url)
+        content = await self.wiki_processor.afetch_content(page.url)
         
         if not content:
             raise WikipediaError(f"Failed to refresh content from {page.url}")
@@ -79,21 +152,30 @@ class WikipediaService:
         page.content = content.basic_info.text
         page.last_fetched = datetime.datetime.utcnow()
         
-        self.db_session.commit()
-        self.db_session.refresh(page)
+        # The session does not expire on commit, so the values just assigned stay loaded without a refresh
+        await self.db_session.commit()
         
         return page
     
-    def get_sections(self, page_id: int) -> Dict[str, str]:
+    async def get_sections(self, page_id: int) -> Dict[str, str]:
         """
         Get sections for a Wikipedia page using the ContentProcessor.
         """
-        page = self.db_session.query(WikipediaPage).filter(WikipediaPage.id == page_id).first()
+        page = await self.db_session.get(WikipediaPage, page_id)
         if not page:
             raise WikipediaError(f"Wikipedia page with ID {page_id} not found")
         
+        content_hash = hashlib.blake2b(page.content.encode(), digest_size=16).hexdigest()
+        sections = _sections_cache.get(content_hash)
+        if sections is not None:
+            _sections_cache.move_to_end(content_hash)
+            return sections
+        
         # Convert to markdown and split into sections
         markdown_text = self.content_processor.convert_to_markdown(page.content)
         sections = self.content_processor.chunk_content(markdown_text)
         
+        _sections_cache[content_hash] = sections
+        if len(_sections_cache) > SECTIONS_CACHE_SIZE:
+            _sections_cache.popitem(last=False)
         return sections 
@@ -0,0 +1,156 @@
+import re
+from html.parser import HTMLParser
+from io import StringIO
+from typing import List, Optional, Tuple
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_HIDDEN_STYLE_RE = re.compile(r'display\s*:\s*none')
+_TRAILING_SPACE_RE = re.compile(r'[ \t]+\n')
+
+HEADINGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+BLOCKS = {'p', 'div', 'section', 'blockquote', 'dl', 'dt', 'dd', 'table', 'figure', 'figcaption'}
+EMPHASIS = {'b': '**', 'strong': '**', 'i': '*', 'em': '*'}
+SKIPPED = {'script', 'style', 'head', 'noscript'}
+# elements that never get an end tag, so they must not start a skipped span
+VOID = {'img', 'br', 'hr', 'input', 'meta', 'link', 'wbr', 'source', 'area', 'col', 'embed', 'param', 'track'}
+# footnote markers such as [1] and [citation needed]
+SKIPPED_SUP_CLASSES = {'reference', 'noprint'}
+
+class MarkdownWriter(HTMLParser):
+    """
+    Event-driven HTML to markdown converter that writes straight to a buffer instead of building a DOM.
+    Tables come out as pipe-delimited rows without a header separator, so they are not GFM tables.
+    """
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out = StringIO()
+        self.at_line_start = True
+        self.trailing_newlines = 0
+        self.after_marker = False  # a heading or list marker was just written, so leading whitespace is dropped
+        self.lists: List[Optional[int]] = []  # one entry per open list: None for ul, next item number for ol
+        self.links: List[Optional[str]] = []
+        self.pre_depth = 0
+        self.skip_tag: Optional[str] = None
+        self.skip_depth = 0
+
+    def _write(self, text: str) -> None:
+        self.out.write(text)
+        stripped = text.rstrip('\n')
+        self.trailing_newlines = len(text) - len(stripped) + (0 if stripped else self.trailing_newlines)
+        self.at_line_start = text.endswith('\n')
+        self.after_marker = False
+
+    def _write_marker(self, marker: str) -> None:
+        self._write(marker)
+        self.after_marker = True
+
+    def _block_break(self) -> None:
+        # blocks are separated by exactly one blank line, however many block tags open or close in a row
+        if self.out.tell() and self.trailing_newlines < 2:
+            self._write('\n' * (2 - self.trailing_newlines))
+
+    def _is_skipped(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> bool:
+        if tag in SKIPPED:
+            return True
+        attributes = dict(attrs)
+        if tag == 'sup' and SKIPPED_SUP_CLASSES & set((attributes.get('class') or '').split()):
+            return True
+        return bool(_HIDDEN_STYLE_RE.search(attributes.get('style') or ''))
+
+    def handle_starttag(self, tag: str, attrs: List[Tuple[str, Optional[str]]]) -> None:
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth += 1
+            return
+        if self._is_skipped(tag, attrs):
+            # a void element never gets an end tag, so waiting for one would drop the rest of the page
+            if tag not in VOID:
+                self.skip_tag, self.skip_depth = tag, 1
+            return
+
+        if tag in HEADINGS:
+            self._block_break()
+            self._write_marker('#' * HEADINGS[tag] + ' ')
+        elif tag in BLOCKS:
+            self._block_break()
+        elif tag in EMPHASIS:
+            self._write(EMPHASIS[tag])
+        elif tag in ('ul', 'ol'):
+            if not self.lists:
+                self._block_break()
+            self.lists.append(1 if tag == 'ol' else None)
+        elif tag == 'li':
+            indent = '  ' * max(len(self.lists) - 1, 0)
+            number = self.lists[-1] if self.lists else None
+            if number is None:
+                marker = '- '
+            else:
+                marker = f'{number}. '
+                self.lists[-1] = number + 1
+            self._write_marker(('' if self.at_line_start else '\n') + indent + marker)
+        elif tag == 'br':
+            self._write('\n')
+        elif tag == 'tr':
+            if not self.at_line_start:
+                self._write('\n')
+        elif tag in ('td', 'th'):
+            self._write('| ' if self.at_line_start else ' | ')
+        elif tag == 'pre':
+            self.pre_depth += 1
+            self._block_break()
+            self._write('```\n')
+        elif tag == 'code' and not self.pre_depth:
+            self._write('`')
+        elif tag == 'a':
+            href = dict(attrs).get('href')
+            self.links.append(href)
+            if href:
+                self._write('[')
+
+    def handle_endtag(self, tag: str) -> None:
+        if self.skip_tag:
+            if tag == self.skip_tag:
+                self.skip_depth -= 1
+                if not self.skip_depth:
+                    self.skip_tag = None
+            return
+
+        if tag in HEADINGS or tag in BLOCKS:
+            self._block_break()
+        elif tag in EMPHASIS:
+            self._write(EMPHASIS[tag])
+        elif tag in ('ul', 'ol'):
+            if self.lists:
+                self.lists.pop()
+            if not self.lists:
+                self._block_break()
+        elif tag == 'pre':
+            self.pre_depth = max(self.pre_depth - 1, 0)
+            self._write('\n```')
+            self._block_break()
+        elif tag == 'code' and not self.pre_depth:
+            self._write('`')
+        elif tag == 'a' and self.links:
+            href = self.links.pop()
+            if href:
+                self._write(f']({href})')
+
+    def handle_data(self, data: str) -> None:
+        if self.skip_tag:
+            return
+        if self.pre_depth:
+            self._write(data)
+            return
+        text = _WHITESPACE_RE.sub(' ', data)
+        if self.at_line_start or self.after_marker:
+            text = text.lstrip()
+        if text:
+            self._write(text)
+
+def html_to_markdown(html: str) -> str:
+    """Convert HTML to markdown in a single streaming pass"""
+    writer = MarkdownWriter()
+    writer.feed(html)
+    writer.close()
+    return _TRAILING_SPACE_RE.sub('\n', writer.out.getvalue())
@@ -1,42 +1,143 @@
-import wikipediaapi
-from typing import Optional, Dict, List
-from pydantic import BaseModel, Field
-from urllib.parse import urlparse
+import httpx
+from typing import Optional, Dict, List, Union
+from dataclasses import dataclass
+from urllib.parse import urlparse, unquote
+import logging
 import re
-from markdownify import markdownify as md
+import threading
+from bs4 import BeautifulSoup
+from markdownify import MarkdownConverter
+from app.utils.html_markdown import html_to_markdown as stream_html_to_markdown
 import os
 from dotenv import load_dotenv
 
 load_dotenv()
 
-class BasicInfo(BaseModel):
+logger = logging.getLogger(__name__)
+
+# compiled once at import instead of looked up in re's internal cache on every conversion
+_BLANK_RE = re.compile(r'\n{3,}')
+# a whole ATX header line
+_HEADER_RE = re.compile(r'^#{1,6}\s[^\n]*', re.MULTILINE)
+# Wikipedia URLs typically have format /wiki/Page_Title
+_WIKI_PATH_RE = re.compile(r'^/wiki/([^/]+)')
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    # httpx only speaks HTTP/2 with the h2 extra installed (pip install httpx[http2])
+    HTTP2_AVAILABLE = False
+
+# footnote markers such as [1] and [citation needed]
+REFERENCE_SELECTOR = 'sup.reference, sup.noprint'
+
+try:
+    from html_to_markdown import convert as convert_html, ConversionOptions
+except ImportError:
+    # html-to-markdown (Rust) is optional; without it pages are converted with pure-Python markdownify
+    convert_html = None
+
+# html_to_markdown (Rust, the default when installed), streaming (stdlib event parser, no DOM) or markdownify
+MARKDOWN_BACKEND = os.getenv("MARKDOWN_BACKEND") or ("html_to_markdown" if convert_html is not None else "streaming")
+USE_FAST_MARKDOWN = MARKDOWN_BACKEND == "html_to_markdown" and convert_html is not None
+FAST_MARKDOWN_OPTIONS = ConversionOptions(
+    heading_style='atx',
+    bullets='-',
+    exclude_selectors=[REFERENCE_SELECTOR],  # drop footnote markers while parsing instead of regexing them out after
+    extract_metadata=False,
+) if USE_FAST_MARKDOWN else None
+
+API_URL = "https://en.wikipedia.org/w/api.php"
+USER_AGENT = 'BiasAnalyzer/1.0 (your@email.com)'  # Replace with your email
+# MediaWiki etiquette caps the titles= parameter at 50 pages per request
+MAX_TITLES_PER_REQUEST = 50
+# only a preview of each page's internal links is kept
+LINK_PREVIEW_COUNT = 10
+
+# one Action API query returns the HTML extract, categories, links, language links and page info together
+QUERY_PARAMS = {
+    "action": "query",
+    "format": "json",
+    "formatversion": "2",
+    "prop": "extracts|categories|links|langlinks|info",
+    "redirects": "1",
+    "exlimit": "max",
+    "cllimit": "max",
+    "pllimit": str(LINK_PREVIEW_COUNT),
+    "plnamespace": "0",
+    "lllimit": "max",
+}
+
+_http: Optional[httpx.Client] = None
+_async_http: Optional[httpx.AsyncClient] = None
+_http_lock = threading.Lock()
+
+def get_http_client() -> httpx.Client:
+    """Return the process-wide HTTP client so every processor reuses one keep-alive connection pool"""
+    global _http
+    if _http is None:
+        with _http_lock:
+            if _http is None:
+                _http = httpx.Client(headers={"User-Agent": USER_AGENT}, timeout=30.0)
+    return _http
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """Async counterpart of get_http_client, shared by every coroutine on the event loop"""
+    global _async_http
+    if _async_http is None:
+        with _http_lock:
+            if _async_http is None:
+                _async_http = httpx.AsyncClient(
+                    headers={"User-Agent": USER_AGENT},
+                    timeout=30.0,
+                    http2=HTTP2_AVAILABLE,
+                    limits=httpx.Limits(max_keepalive_connections=20),
+                )
+    return _async_http
+
+async def close_http_clients() -> None:
+    """Close the shared HTTP clients; the next get_*_client call opens fresh ones"""
+    global _http, _async_http
+    with _http_lock:
+        http, async_http = _http, _async_http
+        _http = _async_http = None
+    if http is not None:
+        http.close()
+    if async_http is not None:
+        await async_http.aclose()
+
+# Internal DTOs built on every fetch and never validated or serialized by FastAPI,
+# so they are plain slotted dataclasses rather than pydantic models.
+@dataclass(slots=True, frozen=True)
+class BasicInfo:
     title: str
     summary: str
     url: str
     page_id: int
     text: str
-class Metadata(BaseModel):
+
+@dataclass(slots=True, frozen=True)
+class Metadata:
     language: str
 
-class Links(BaseModel):
+@dataclass(slots=True, frozen=True)
+class Links:
     categories: list[str]
     internal_links: list[str]
     languages: list[str]
 
-class WikipediaContent(BaseModel):
-    """Pydantic model for storing Wikipedia content"""
+@dataclass(slots=True, frozen=True)
+class WikipediaContent:
+    """Wikipedia content fetched for a single page"""
     basic_info: BasicInfo
     metadata: Metadata
     links: Links
 
 class WikipediaProcessor:
     def __init__(self):
-        # Initialize with English Wikipedia
-        self.wiki = wikipediaapi.Wikipedia(
-            language='en',
-            extract_format=wikipediaapi.ExtractFormat.HTML,
-            user_agent='BiasAnalyzer/1.0 (your@email.com)'  # Replace with your email
-        )
+        self.http = get_http_client()
+        self.async_http = get_async_http_client()
 
     def extract_page_title_from_url(self, url: str) -> str:
         """Extract the page title from a Wikipedia URL"""
@@ -45,53 +146,136 @@ class WikipediaProcessor:
             raise ValueError("Not a valid Wikipedia URL")
         
         # Extract the title from the path
-        path_parts = parsed_url.path.split('/')
-        # Wikipedia URLs typically have format /wiki/Page_Title
-        if len(path_parts) < 3 or path_parts[1] != 'wiki':
+        match = _WIKI_PATH_RE.match(parsed_url.path)
+        if not match:
             raise ValueError("Invalid Wikipedia URL format")
         
-        return path_parts[2]
+        return match.group(1)
 
     def fetch_content(self, url: str) -> Optional[WikipediaContent]:
         """Get more detailed content from a Wikipedia page"""
         try:
-            page_title = self.extract_page_title_from_url(url)
-            page = self.wiki.page(page_title)
-            print(page.__getattr__("text"))
-            # Save page data as JSON for testing
-            # import json
-            # import os
-            
-            # test_fixtures_dir = os.path.join("wikipedia-bias-analyzer","tests", "fixtures")
-            # os.makedirs(test_fixtures_dir, exist_ok=True)
-            
-            # with open(os.path.join(test_fixtures_dir, "python_page.json"), "w") as f:
-            #     json.dump(page.__dict__, f, indent=2)
-            
-            if not page.exists():
-                return None
-            
-            return WikipediaContent(
-                basic_info=BasicInfo(
-                    title=page.title,
-                    summary=page.summary,
-                    url=url,  # Use the original URL passed to the function
-                    page_id=page.pageid,
-                    text=page.text,
-                ),
-                metadata=Metadata(
-                    language=page.language,
-                ),
-                links=Links(
-                    categories=list(page.categories.keys()),
-                    internal_links=list(page.links.keys())[:10],  # First 10 links
-                    languages=list(page.langlinks.keys()),
-                )
-            )
-            
+            return self.fetch_contents([url])[url]
+        except Exception as e:
+            raise Exception(f"Error fetching Wikipedia content: {str(e)}")
+
+    async def afetch_content(self, url: str) -> Optional[WikipediaContent]:
+        """Async variant of fetch_content that does not tie up a worker thread while waiting on Wikipedia"""
+        try:
+            return (await self.afetch_contents([url]))[url]
         except Exception as e:
             raise Exception(f"Error fetching Wikipedia content: {str(e)}")
 
+    def fetch_contents(self, urls: List[str]) -> Dict[str, Optional[WikipediaContent]]:
+        """Fetch several pages with one batched API query per 50 titles, mapping each URL to its content"""
+        titles = self._titles_by_url(urls)
+        pages: Dict[str, dict] = {}
+        aliases: Dict[str, str] = {}
+        for batch in self._title_batches(titles):
+            params = {**QUERY_PARAMS, "titles": "|".join(batch)}
+            while params:
+                response = self.http.get(API_URL, params=params)
+                response.raise_for_status()
+                params = self._merge_query(response.json(), params, pages, aliases)
+        return self._contents_by_url(titles, pages, aliases)
+
+    async def afetch_contents(self, urls: List[str]) -> Dict[str, Optional[WikipediaContent]]:
+        """Async variant of fetch_contents"""
+        titles = self._titles_by_url(urls)
+        pages: Dict[str, dict] = {}
+        aliases: Dict[str, str] = {}
+        for batch in self._title_batches(titles):
+            params = {**QUERY_PARAMS, "titles": "|".join(batch)}
+            while params:
+                response = await self.async_http.get(API_URL, params=params)
+                response.raise_for_status()
+                params = self._merge_query(response.json(), params, pages, aliases)
+        return self._contents_by_url(titles, pages, aliases)
+
+    def _titles_by_url(self, urls: List[str]) -> Dict[str, str]:
+        return {url: unquote(self.extract_page_title_from_url(url)).replace('_', ' ') for url in urls}
+
+    @staticmethod
+    def _title_batches(titles: Dict[str, str]) -> List[List[str]]:
+        unique_titles = list(dict.fromkeys(titles.values()))
+        return [unique_titles[i:i + MAX_TITLES_PER_REQUEST] for i in range(0, len(unique_titles), MAX_TITLES_PER_REQUEST)]
+
+    @staticmethod
+    def _merge_query(data: dict, params: dict, pages: Dict[str, dict], aliases: Dict[str, str]) -> Optional[dict]:
+        """Merge the response to params into the per-page results, returning the params of the continuation request if any"""
+        query = data.get("query", {})
+        for mapping in query.get("normalized", []) + query.get("redirects", []):
+            aliases[mapping["from"]] = mapping["to"]
+        for page in query.get("pages", []):
+            merged = pages.setdefault(page["title"], {"categories": [], "links": [], "langlinks": []})
+            for key in ("categories", "links", "langlinks"):
+                merged[key].extend(page.pop(key, []))
+            merged.update(page)
+
+        if "continue" not in data:
+            return None
+        titles = params["titles"].split("|")
+        # prop is carried over so that links stay dropped once every page has its preview
+        params = {**QUERY_PARAMS, "titles": params["titles"], "prop": params["prop"], **data["continue"]}
+
+        # links are paged in page id order; once a page has its preview, jump straight to the next page's
+        # links instead of paging through all of them, and stop querying links after the last page
+        plcontinue = params.pop("plcontinue", None)
+        if plcontinue is not None:
+            page_id = int(plcontinue.split("|", 1)[0])
+            batch_pages = {}
+            for title in titles:
+                page = pages.get(WikipediaProcessor._resolve(title, aliases))
+                if page and "pageid" in page:
+                    batch_pages[page["pageid"]] = page
+            next_ids = sorted(other_id for other_id in batch_pages if other_id > page_id)
+            if page_id in batch_pages and len(batch_pages[page_id]["links"]) < LINK_PREVIEW_COUNT:
+                params["plcontinue"] = plcontinue
+            elif next_ids:
+                params["plcontinue"] = f"{next_ids[0]}|0|"
+            elif set(data["continue"]) <= {"continue", "plcontinue"}:
+                # links were all that was left to page through
+                return None
+            else:
+                params["prop"] = params["prop"].replace("|links", "")
+        return params
+
+    @staticmethod
+    def _resolve(title: str, aliases: Dict[str, str]) -> str:
+        """Follow normalization and redirects from a requested title to the title of the page returned for it"""
+        while title in aliases:
+            title = aliases[title]
+        return title
+
+    def _contents_by_url(self, titles: Dict[str, str], pages: Dict[str, dict], aliases: Dict[str, str]) -> Dict[str, Optional[WikipediaContent]]:
+        contents = {}
+        for url, title in titles.items():
+            page = pages.get(self._resolve(title, aliases))
+            # missing pages and invalid titles come back without a pageid and have no content
+            contents[url] = self._build_content(url, page) if page and "pageid" in page and not page.get("missing") else None
+        return contents
+
+    def _build_content(self, url: str, page: dict) -> WikipediaContent:
+        text = page.get("extract", "")
+        logger.debug("fetched %s chars from %s", len(text), url)
+        return WikipediaContent(
+            basic_info=BasicInfo(
+                title=page["title"],
+                summary=text.split("<h2", 1)[0].strip(),  # lead section, before the first heading
+                url=url,  # Use the original URL passed to the function
+                page_id=page["pageid"],
+                text=text,
+            ),
+            metadata=Metadata(
+                language=page.get("pagelanguage", "en"),
+            ),
+            links=Links(
+                categories=[category["title"] for category in page["categories"]],
+                internal_links=[link["title"] for link in page["links"][:LINK_PREVIEW_COUNT]],
+                languages=[langlink["lang"] for langlink in page["langlinks"]],
+            )
+        )
+
     def validate_url(self, url: str) -> bool:
         """Validate if the given URL is a valid Wikipedia URL"""
         try:
@@ -116,56 +300,52 @@ class ContentProcessor:
                 # Convert to markdown
 
                 markdown_content = self.convert_to_markdown(content)
-                print("\nConverted Markdown Content (preview):")
-                # print(markdown_content + "...\n")
-                # print(len(markdown_content))
+                logger.debug("converted %s to %s chars of markdown", url, len(markdown_content))
                 
                 # Show chunks
                 chunks = self.chunk_content(markdown_content)
                 return chunks
         return None
 
-    def convert_to_markdown(self, content: WikipediaContent) -> str:
-        """Convert the Wikipedia HTML content to markdown format"""
-        # Configure basic markdownify options
-        markdown_options = {
-            'heading_style': 'ATX',  # Use # style headers
-            'bullets': '-',          # Use - for unordered lists
-        }
-        
-        # Convert HTML content to markdown
-        markdown_text = md(content.basic_info.text, **markdown_options)
+    def convert_to_markdown(self, content: Union[WikipediaContent, str]) -> str:
+        """Convert the Wikipedia HTML content (or stored page HTML) to markdown format"""
+        html = content if isinstance(content, str) else content.basic_info.text
+        if USE_FAST_MARKDOWN:
+            markdown_text = convert_html(html, FAST_MARKDOWN_OPTIONS).content
+        elif MARKDOWN_BACKEND != "markdownify":
+            # Footnote markers are skipped by the writer as it goes
+            markdown_text = stream_html_to_markdown(html)
+        else:
+            # Configure basic markdownify options
+            markdown_options = {
+                'heading_style': 'ATX',  # Use # style headers
+                'bullets': '-',          # Use - for unordered lists
+            }
+            
+            # Drop footnote markers from the parsed tree so they are never converted, rather than
+            # regexing "[n]" out of the markdown afterwards; markdownify would parse the HTML the same way
+            soup = BeautifulSoup(html, 'html.parser')
+            for sup in soup.select(REFERENCE_SELECTOR):
+                sup.decompose()
+
+            # Convert HTML content to markdown
+            markdown_text = MarkdownConverter(**markdown_options).convert_soup(soup)
 
-        # Clean up reference numbers and extra whitespace
-        markdown_text = re.sub(r'\[\d+\]', '', markdown_text)
-        markdown_text = re.sub(r'\n{3,}', '\n\n', markdown_text)
+        # Clean up extra whitespace
+        markdown_text = _BLANK_RE.sub('\n\n', markdown_text)
         
         return markdown_text.strip()
 
     def chunk_content(self, markdown_text: str) -> Dict[str, str]:
         """Split content into sections based on headers for section-by-section analysis"""
-        sections = {}
-        current_section = "Introduction"  # Default section for content before first header
-        current_content = []
-        
-        # Split by paragraphs while preserving headers
-        paragraphs = markdown_text.split('\n\n')
-        
-        for paragraph in paragraphs:
-            # Check if paragraph is a header
-            if paragraph.startswith('#'):
-                # Save previous section if it has content
-                if current_content:
-                    sections[current_section] = '\n\n'.join(current_content)
-                    current_content = []
-                
-                # Update current section title (remove #s and whitespace)
-                current_section = paragraph.lstrip('#').strip()
-            else:
-                current_content.append(paragraph)
-        
-        # Add the last section if it has content
-        if current_content:
-            sections[current_section] = '\n\n'.join(current_content)
-        
-        return sections
+        # One scan for the header spans; each section body is then a single slice between consecutive headers
+        headers = list(_HEADER_RE.finditer(markdown_text))
+        titles = ["Introduction"] + [header.group().lstrip('#').strip() for header in headers]
+        starts = [0] + [header.end() for header in headers]
+        ends = [header.start() for header in headers] + [len(markdown_text)]
+        # Sections without content are dropped
+        return {
+            title: body
+            for title, start, end in zip(titles, starts, ends)
+            if (body := markdown_text[start:end].strip())
+        }
@@ -8,10 +8,6 @@ from pathlib import Path
 # Add the root directory to Python path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
-from app.main import app
-from app.core.dependencies import get_db
-from app.config import settings
-
 # -------------------------------------------------------------------------------
 # Environment Configuration
 # -------------------------------------------------------------------------------
@@ -36,11 +32,25 @@ def test_env():
 # FastAPI Test Client
 # -------------------------------------------------------------------------------
 
-@pytest.fixture
-def client():
+@pytest.fixture(scope="session")
+def app():
+    """
+    The FastAPI application, imported on first use rather than at collection so that
+    collecting the suite does not build the app's routes, middleware and lifespan. Only
+    app.main is deferred: test modules that import services still load app.database.
+    """
+    from app.main import app
+    return app
+
+@pytest.fixture(scope="session")
+def client(app):
     """
     Test client for making HTTP requests with mocked database.
+    Shared by the whole session so the app lifespan only runs once; tests that
+    override other dependencies must remove their overrides themselves.
     """
+    from app.core.dependencies import get_db
+    
     # Use a mock database for tests
     mock_db = MagicMock()
     
@@ -58,7 +68,7 @@ def client():
     with TestClient(app) as client:
         yield client
     
-    # Reset overrides after test
+    # Reset overrides after the session
     app.dependency_overrides.clear()
 
 # -------------------------------------------------------------------------------
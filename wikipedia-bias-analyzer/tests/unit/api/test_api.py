@@ -9,3 +9,9 @@ def test_health_endpoint(client):
     response = client.get("/health")
     assert response.status_code == 200
     assert response.json() == {"status": "healthy"} 
+
+def test_db_pool_endpoint(client):
+    """Test that the pool status endpoint reports the configured pool."""
+    response = client.get("/health/db-pool")
+    assert response.status_code == 200
+    assert "Pool size" in response.json()["status"]
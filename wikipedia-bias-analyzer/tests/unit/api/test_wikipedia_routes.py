@@ -1,30 +1,27 @@
 import pytest
-from unittest.mock import patch, AsyncMock, MagicMock
+from types import SimpleNamespace
+from unittest.mock import MagicMock
 from fastapi import status
-from fastapi.testclient import TestClient
 import datetime
 
-from app.main import app
-from app.models.wikipedia import WikipediaPage
-
-# Test client for making requests
-client = TestClient(app)
-
-# Use a complete patch for dependency override
-@pytest.fixture(autouse=True)
-def override_dependency():
-    """Override the get_db dependency completely."""
-    with patch("app.api.routes.wikipedia.get_db", autospec=True):
-        yield
-
 class TestWikipediaRoutes:
     """Tests for Wikipedia API endpoints."""
     
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_process_wikipedia_url(self, mock_get_service):
+    @pytest.fixture
+    def mock_get_service(self, app):
+        """Replace the service dependency used by the routes."""
+        from app.api.routes.wikipedia import get_wikipedia_service
+        
+        # The session's client already overrides get_db, so only the service needs replacing
+        mock_get_service = MagicMock()
+        app.dependency_overrides[get_wikipedia_service] = lambda: mock_get_service()
+        yield mock_get_service
+        del app.dependency_overrides[get_wikipedia_service]
+    
+    def test_process_wikipedia_url(self, mock_get_service, client, async_return, now):
         """Test processing a Wikipedia URL."""
         # Setup mock service and response
-        mock_service = AsyncMock()
+        mock_service = MagicMock()
         mock_get_service.return_value = mock_service
         
         # Create a simple dict instead of a model instance
@@ -32,11 +29,11 @@ class TestWikipediaRoutes:
             "id": 1,
             "url": "https://en.wikipedia.org/wiki/Python_(programming_language)",
             "title": "Python (programming language)",
-            "last_fetched": datetime.datetime.utcnow().isoformat()
+            "last_fetched": now.isoformat()
         }
         
         # Return the dict instead of a model
-        mock_service.process_url.return_value = MagicMock(**mock_page)
+        mock_service.process_url = async_return(MagicMock(**mock_page))
         
         # Make request
         response = client.post(
@@ -49,22 +46,67 @@ class TestWikipediaRoutes:
         assert response.json()["id"] == 1
         assert response.json()["url"] == "https://en.wikipedia.org/wiki/Python_(programming_language)"
         assert response.json()["title"] == "Python (programming language)"
-    
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_get_wikipedia_page(self, mock_get_service):
+
+    def test_process_wikipedia_urls(self, mock_get_service, client, async_return, now):
+        """Test processing several Wikipedia URLs, with one of them failing."""
+        # Setup mock service and response
+        mock_service = MagicMock()
+        mock_get_service.return_value = mock_service
+
+        good_url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
+        bad_url = "https://en.wikipedia.org/wiki/Does_not_exist"
+        mock_page = SimpleNamespace(
+            id=1,
+            url=good_url,
+            title="Python (programming language)",
+            content="Content about Python",
+            last_fetched=now
+        )
+        mock_service.process_urls = async_return(([mock_page], {bad_url: "Wikipedia page not found"}))
+
+        # Make request
+        response = client.post("/api/wikipedia/pages/batch", json={"urls": [good_url, bad_url]})
+
+        # Assertions
+        assert response.status_code == status.HTTP_200_OK
+        pages = response.json()["pages"]
+        assert [page["id"] for page in pages] == [1]
+        assert pages[0]["url"] == good_url
+        assert pages[0]["title"] == "Python (programming language)"
+        assert response.json()["errors"] == {bad_url: "Wikipedia page not found"}
+        assert mock_service.process_urls.calls == [([good_url, bad_url],)]
+
+    def test_process_wikipedia_urls_error(self, mock_get_service, client, async_return):
+        """Test that an unexpected failure of the whole batch returns a server error."""
+        # Setup mock service to raise
+        mock_service = MagicMock()
+        mock_get_service.return_value = mock_service
+        mock_service.process_urls = async_return(Exception("database unavailable"))
+
+        # Make request
+        response = client.post(
+            "/api/wikipedia/pages/batch",
+            json={"urls": ["https://en.wikipedia.org/wiki/Python_(programming_language)"]}
+        )
+
+        # Assertions
+        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert "database unavailable" in response.json()["detail"]
+
+    def test_get_wikipedia_page(self, mock_get_service, client, async_return, now):
         """Test retrieving a Wikipedia page by ID."""
         # Setup mock service and response
-        mock_service = AsyncMock()
+        mock_service = MagicMock()
         mock_get_service.return_value = mock_service
         
-        mock_page = WikipediaPage(
+        mock_page = SimpleNamespace(
             id=1,
             url="https://en.wikipedia.org/wiki/Python_(programming_language)",
             title="Python (programming language)",
             content="Content about Python",
-            last_fetched=datetime.datetime.utcnow()
+            last_fetched=now
         )
-        mock_service.get_page.return_value = mock_page
+        mock_service.get_page = async_return(mock_page)
         
         # Make request
         response = client.get("/api/wikipedia/pages/1")
@@ -74,38 +116,36 @@ class TestWikipediaRoutes:
         assert response.json()["id"] == 1
         assert response.json()["url"] == "https://en.wikipedia.org/wiki/Python_(programming_language)"
         assert response.json()["title"] == "Python (programming language)"
-        mock_service.get_page.assert_called_once_with(1)
+        assert mock_service.get_page.calls == [(1,)]
     
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_get_wikipedia_page_not_found(self, mock_get_service):
+    def test_get_wikipedia_page_not_found(self, mock_get_service, client, async_return):
         """Test retrieving a non-existent Wikipedia page."""
         # Setup mock service to return None (page not found)
-        mock_service = AsyncMock()
+        mock_service = MagicMock()
         mock_get_service.return_value = mock_service
-        mock_service.get_page.return_value = None
+        mock_service.get_page = async_return(None)
         
         # Make request
         response = client.get("/api/wikipedia/pages/999")
         
         # Assertions
         assert response.status_code == status.HTTP_404_NOT_FOUND
-        mock_service.get_page.assert_called_once_with(999)
+        assert mock_service.get_page.calls == [(999,)]
     
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_refresh_wikipedia_page(self, mock_get_service):
+    def test_refresh_wikipedia_page(self, mock_get_service, client, async_return, now):
         """Test refreshing a Wikipedia page."""
         # Setup mock service and response
-        mock_service = AsyncMock()
+        mock_service = MagicMock()
         mock_get_service.return_value = mock_service
         
-        mock_page = WikipediaPage(
+        mock_page = SimpleNamespace(
             id=1,
             url="https://en.wikipedia.org/wiki/Python_(programming_language)",
             title="Python (programming language)",
             content="Updated content about Python",
-            last_fetched=datetime.datetime.utcnow()
+            last_fetched=now
         )
-        mock_service.refresh_page.return_value = mock_page
+        mock_service.refresh_page = async_return(mock_page)
         
         # Make request
         response = client.put("/api/wikipedia/pages/1/refresh")
@@ -114,28 +154,26 @@ class TestWikipediaRoutes:
         assert response.status_code == status.HTTP_200_OK
         assert response.json()["id"] == 1
         assert "Updated content" not in response.json()  # Content should not be returned
-        mock_service.refresh_page.assert_called_once_with(1)
+        assert mock_service.refresh_page.calls == [(1,)]
     
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_refresh_wikipedia_page_not_found(self, mock_get_service):
+    def test_refresh_wikipedia_page_not_found(self, mock_get_service, client, async_return):
         """Test refreshing a non-existent Wikipedia page."""
         # Setup mock service to return None (page not found)
-        mock_service = AsyncMock()
+        mock_service = MagicMock()
         mock_get_service.return_value = mock_service
-        mock_service.refresh_page.return_value = None
+        mock_service.refresh_page = async_return(None)
         
         # Make request
         response = client.put("/api/wikipedia/pages/999/refresh")
         
         # Assertions
         assert response.status_code == status.HTTP_404_NOT_FOUND
-        mock_service.refresh_page.assert_called_once_with(999)
+        assert mock_service.refresh_page.calls == [(999,)]
     
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_get_wikipedia_page_sections(self, mock_get_service):
+    def test_get_wikipedia_page_sections(self, mock_get_service, client, async_return, now):
         """Test getting sections of a Wikipedia page."""
         # Setup mock service and response
-        mock_service = AsyncMock()
+        mock_service = MagicMock()
         mock_get_service.return_value = mock_service
         
         mock_sections = {
@@ -143,7 +181,8 @@ class TestWikipediaRoutes:
             "History": "This is the history section.",
             "Features": "These are the features."
         }
-        mock_service.get_sections.return_value = mock_sections
+        mock_service.get_page = async_return(SimpleNamespace(id=1, last_fetched=now))
+        mock_service.get_sections = async_return(mock_sections)
         
         # Make request
         response = client.get("/api/wikipedia/pages/1/sections")
@@ -154,19 +193,87 @@ class TestWikipediaRoutes:
         assert sections["Introduction"] == "This is an introduction."
         assert sections["History"] == "This is the history section."
         assert sections["Features"] == "These are the features."
-        mock_service.get_sections.assert_called_once_with(1)
+        assert mock_service.get_sections.calls == [(1,)]
     
-    @patch("app.api.routes.wikipedia.get_wikipedia_service")
-    async def test_get_wikipedia_page_sections_not_found(self, mock_get_service):
+    def test_get_wikipedia_page_sections_not_found(self, mock_get_service, client, async_return):
         """Test getting sections of a non-existent Wikipedia page."""
-        # Setup mock service to raise WikipediaError
+        # Setup mock service to find no page
         mock_service = MagicMock()
         mock_get_service.return_value = mock_service
-        mock_service.get_sections.side_effect = Exception("Wikipedia page with ID 999 not found")
+        mock_service.get_page = async_return(None)
+        mock_service.get_sections = async_return({})
         
         # Make request
         response = client.get("/api/wikipedia/pages/999/sections")
         
         # Assertions
         assert response.status_code == status.HTTP_404_NOT_FOUND
-        mock_service.get_sections.assert_called_once_with(999) 
+        assert mock_service.get_page.calls == [(999,)]
+        assert mock_service.get_sections.calls == []
+
+
+class TestWikipediaCaching:
+    """Tests for ETag revalidation of page and section responses."""
+
+    @pytest.fixture
+    def page(self):
+        return SimpleNamespace(
+            id=1,
+            url="https://en.wikipedia.org/wiki/Python_(programming_language)",
+            title="Python (programming language)",
+            content="Content about Python",
+            last_fetched=datetime.datetime(2024, 1, 1, 12, 0, 0)
+        )
+
+    @pytest.fixture
+    def mock_service(self, app, client, page, async_return):
+        from app.api.routes.wikipedia import get_wikipedia_service
+
+        service = MagicMock()
+        service.get_page = async_return(page)
+        service.get_sections = async_return({"Introduction": "This is an introduction."})
+        app.dependency_overrides[get_wikipedia_service] = lambda: service
+        yield service
+        del app.dependency_overrides[get_wikipedia_service]
+
+    def test_get_page_sets_etag(self, client, mock_service):
+        """Test that a page response carries an ETag and Cache-Control."""
+        response = client.get("/api/wikipedia/pages/1")
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"].startswith('W/"1-')
+        assert response.headers["cache-control"] == "no-cache"
+
+    def test_get_page_not_modified(self, client, mock_service):
+        """Test that a matching If-None-Match returns 304 without a body."""
+        etag = client.get("/api/wikipedia/pages/1").headers["etag"]
+
+        response = client.get("/api/wikipedia/pages/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response.content == b""
+        assert response.headers["etag"] == etag
+
+    def test_sections_not_modified_skips_conversion(self, client, mock_service):
+        """Test that revalidating sections does not rebuild them."""
+        response = client.get("/api/wikipedia/pages/1/sections")
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {"Introduction": "This is an introduction."}
+
+        response = client.get(
+            "/api/wikipedia/pages/1/sections",
+            headers={"If-None-Match": f'"other", {response.headers["etag"]}'}
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert mock_service.get_sections.calls == [(1,)]
+
+    def test_refreshed_page_changes_etag(self, client, mock_service, page):
+        """Test that a refreshed page no longer matches the old ETag."""
+        etag = client.get("/api/wikipedia/pages/1").headers["etag"]
+        page.last_fetched = datetime.datetime(2024, 1, 2, 12, 0, 0)
+
+        response = client.get("/api/wikipedia/pages/1", headers={"If-None-Match": etag})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.headers["etag"] != etag
@@ -1,127 +1,162 @@
+import copy
 import pytest
+from types import SimpleNamespace
 from unittest.mock import MagicMock
 import datetime
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.wikipedia import WikipediaPage
-from app.models.prompt import PromptTemplate
-from app.models.analysis import (
-    BiasAnalysis, 
-    AggregatedResult, 
-    BiasResult, 
-    BiasInstance
-)
+_NOW = datetime.datetime.utcnow()
+
+def link_related(models: dict) -> dict:
+    """Point the related model mocks at each other the way the ORM relationships would."""
+    models['analysis'].page = models['page']
+    models['analysis'].prompt = models['prompt']
+    models['page'].analyses = [models['analysis']]
+    
+    models['agg_result'].analysis = models['analysis']
+    models['analysis'].aggregated_results = [models['agg_result']]
+    
+    models['bias_result'].aggregated_result = models['agg_result']
+    models['agg_result'].results = [models['bias_result']]
+    
+    models['bias_instance'].result = models['bias_result']
+    models['bias_result'].bias_instances = [models['bias_instance']]
+    
+    return models
+
+@pytest.fixture(scope="session")
+def now():
+    """One timestamp for every mock page and analysis in the session."""
+    return _NOW
+
+@pytest.fixture(scope="session")
+def _related_prototype():
+    """
+    Attribute values for the model mocks, built once per session. The tests only read
+    attributes, so plain namespaces stand in for the models and fixtures hand out copies.
+    """
+    return {
+        'page': SimpleNamespace(
+            id=1,
+            url="https://en.wikipedia.org/wiki/Python_(programming_language)",
+            title="Python (programming language)",
+            content="Python is a high-level programming language...",
+            last_fetched=_NOW
+        ),
+        'prompt': SimpleNamespace(
+            id=1,
+            name="Test Prompt",
+            description="A test prompt template",
+            prompt_text="This is a test prompt with {{variable}}.",
+            is_active=True,
+            is_default=False
+        ),
+        'analysis': SimpleNamespace(
+            id=1,
+            page_id=1,
+            prompt_id=1,
+            status="completed",
+            created_at=_NOW
+        ),
+        'agg_result': SimpleNamespace(
+            id=1,
+            analysis_id=1,
+            section_name="Introduction",
+            biased_phrases={"phrase1": 2, "phrase2": 1},
+            heatmap_data=[{"start": 0, "end": 10, "score": 0.8}]
+        ),
+        'bias_result': SimpleNamespace(
+            id=1,
+            aggregated_result_id=1,
+            section_name="Introduction",
+            section_content="This is the section content.",
+            iteration=1,
+            raw_llm_response="Raw LLM response here."
+        ),
+        'bias_instance': SimpleNamespace(
+            id=1,
+            result_id=1,
+            bias_type="Political",
+            rationale="This shows political bias because...",
+            affected_stakeholder="Political group",
+            biased_phrase="controversial policy"
+        )
+    }
+
+@pytest.fixture(scope="session")
+def async_return():
+    """
+    Factory for cheap coroutine stubs standing in for AsyncMock when only the result matters.
+    A stub returns its value, or raises it if it is an exception, and records each call's
+    positional arguments in its calls list.
+    """
+    def make_stub(value=None):
+        async def stub(*args, **kwargs):
+            stub.calls.append(args)
+            if isinstance(value, BaseException):
+                raise value
+            return value
+        stub.calls = []
+        return stub
+    return make_stub
+
+@pytest.fixture(scope="session")
+def _session_db():
+    """One spec'd async DB session mock for the session, since spec introspects AsyncSession."""
+    return MagicMock(spec=AsyncSession)
 
 @pytest.fixture
-def mock_db_session():
-    """Create a fully mocked DB session."""
-    session = MagicMock()
-    # Default return values for common query patterns
-    session.query.return_value.filter.return_value.first.return_value = None
-    session.query.return_value.all.return_value = []
-    return session
+def mock_db_session(_session_db):
+    """Hand out the shared async DB session mock reset to its defaults."""
+    # return_value=True also drops whatever results the previous test configured
+    _session_db.reset_mock(return_value=True, side_effect=True)
+    _session_db.get.return_value = None
+    _session_db.execute.return_value = MagicMock()
+    _session_db.execute.return_value.scalar_one_or_none.return_value = None
+    return _session_db
 
 @pytest.fixture
-def mock_wikipedia_page():
-    """Create a mock Wikipedia page."""
-    page = MagicMock(spec=WikipediaPage)
-    page.id = 1
-    page.url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
-    page.title = "Python (programming language)"
-    page.content = "Python is a high-level programming language..."
-    page.last_fetched = datetime.datetime.now()
+def mock_wikipedia_page(_related_prototype):
+    """
+    Create a mock Wikipedia page. Like the other model fixtures, the copy gets its own
+    relationship lists so a test appending to one cannot change the prototype.
+    """
+    page = copy.copy(_related_prototype['page'])
     page.analyses = []
-    
     return page
 
 @pytest.fixture
-def mock_prompt_template():
+def mock_prompt_template(_related_prototype):
     """Create a mock prompt template."""
-    prompt = MagicMock(spec=PromptTemplate)
-    prompt.id = 1
-    prompt.name = "Test Prompt"
-    prompt.description = "A test prompt template"
-    prompt.prompt_text = "This is a test prompt with {{variable}}."
-    prompt.is_active = True
-    prompt.is_default = False
-    
-    return prompt
+    return copy.copy(_related_prototype['prompt'])
 
 @pytest.fixture
-def mock_bias_analysis():
+def mock_bias_analysis(_related_prototype):
     """Create a mock bias analysis."""
-    analysis = MagicMock(spec=BiasAnalysis)
-    analysis.id = 1
-    analysis.page_id = 1
-    analysis.prompt_id = 1
-    analysis.status = "completed"
-    analysis.created_at = datetime.datetime.now()
+    analysis = copy.copy(_related_prototype['analysis'])
     analysis.aggregated_results = []
-    
     return analysis
 
 @pytest.fixture
-def mock_aggregated_result():
+def mock_aggregated_result(_related_prototype):
     """Create a mock aggregated result."""
-    agg_result = MagicMock(spec=AggregatedResult)
-    agg_result.id = 1
-    agg_result.analysis_id = 1
-    agg_result.section_name = "Introduction"
-    agg_result.biased_phrases = {"phrase1": 2, "phrase2": 1}
-    agg_result.heatmap_data = [{"start": 0, "end": 10, "score": 0.8}]
+    agg_result = copy.copy(_related_prototype['agg_result'])
     agg_result.results = []
-    
     return agg_result
 
 @pytest.fixture
-def mock_bias_result():
+def mock_bias_result(_related_prototype):
     """Create a mock bias result."""
-    bias_result = MagicMock(spec=BiasResult)
-    bias_result.id = 1
-    bias_result.aggregated_result_id = 1
-    bias_result.section_name = "Introduction"
-    bias_result.section_content = "This is the section content."
-    bias_result.iteration = 1
-    bias_result.raw_llm_response = "Raw LLM response here."
+    bias_result = copy.copy(_related_prototype['bias_result'])
     bias_result.bias_instances = []
-    
     return bias_result
 
 @pytest.fixture
-def mock_bias_instance():
+def mock_bias_instance(_related_prototype):
     """Create a mock bias instance."""
-    bias_instance = MagicMock(spec=BiasInstance)
-    bias_instance.id = 1
-    bias_instance.result_id = 1
-    bias_instance.bias_type = "Political"
-    bias_instance.rationale = "This shows political bias because..."
-    bias_instance.affected_stakeholder = "Political group"
-    bias_instance.biased_phrase = "controversial policy"
-    
-    return bias_instance
+    return copy.copy(_related_prototype['bias_instance'])
 
 @pytest.fixture
-def mock_related_models(mock_wikipedia_page, mock_prompt_template, mock_bias_analysis, 
-                         mock_aggregated_result, mock_bias_result, mock_bias_instance):
+def mock_related_models(_related_prototype):
     """Create a set of related model instances with proper relationships."""
-    # Set up relationships
-    mock_bias_analysis.page = mock_wikipedia_page
-    mock_bias_analysis.prompt = mock_prompt_template
-    mock_wikipedia_page.analyses = [mock_bias_analysis]
-    
-    mock_aggregated_result.analysis = mock_bias_analysis
-    mock_bias_analysis.aggregated_results = [mock_aggregated_result]
-    
-    mock_bias_result.aggregated_result = mock_aggregated_result
-    mock_aggregated_result.results = [mock_bias_result]
-    
-    mock_bias_instance.result = mock_bias_result
-    mock_bias_result.bias_instances = [mock_bias_instance]
-    
-    return {
-        'page': mock_wikipedia_page,
-        'prompt': mock_prompt_template,
-        'analysis': mock_bias_analysis,
-        'agg_result': mock_aggregated_result,
-        'bias_result': mock_bias_result,
-        'bias_instance': mock_bias_instance
-    } 
+    return link_related({name: copy.copy(model) for name, model in _related_prototype.items()})
@@ -0,0 +1,36 @@
+import pytest
+
+@pytest.mark.parametrize("fixture_name,expected", [
+    ("mock_aggregated_result", {
+        "id": 1,
+        "analysis_id": 1,
+        "section_name": "Introduction",
+        "biased_phrases": {"phrase1": 2, "phrase2": 1},
+        "heatmap_data": [{"start": 0, "end": 10, "score": 0.8}]
+    }),
+    ("mock_bias_result", {
+        "id": 1,
+        "aggregated_result_id": 1,
+        "section_name": "Introduction",
+        "iteration": 1
+    }),
+    ("mock_bias_instance", {
+        "id": 1,
+        "result_id": 1,
+        "bias_type": "Political",
+        "rationale": "This shows political bias because..."
+    }),
+    ("mock_prompt_template", {
+        "id": 1,
+        "name": "Test Prompt",
+        "description": "A test prompt template",
+        "prompt_text": "This is a test prompt with {{variable}}.",
+        "is_active": True,
+        "is_default": False
+    }),
+])
+def test_model_attributes(request, fixture_name, expected):
+    """Test that each model mock has the expected attributes."""
+    model = request.getfixturevalue(fixture_name)
+    for name, value in expected.items():
+        assert getattr(model, name) == value, name
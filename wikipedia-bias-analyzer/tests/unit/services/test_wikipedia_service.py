@@ -1,20 +1,26 @@
 import pytest
-from unittest.mock import patch, MagicMock, PropertyMock
+from unittest.mock import MagicMock, AsyncMock
 import datetime
+from sqlalchemy.dialects import postgresql
 
 from app.models.wikipedia import WikipediaPage
-from app.services.wikipedia_service import WikipediaService
+from app.services.wikipedia_service import WikipediaService, _sections_cache
 from app.core.exceptions import WikipediaError
 from app.utils.wiki_parsing import WikipediaContent, BasicInfo, Metadata, Links
 
-# Add pytest-asyncio markers to test file
-pytestmark = pytest.mark.asyncio
+@pytest.fixture(autouse=True)
+def clear_sections_cache():
+    """Start every test with an empty rendered-sections cache."""
+    _sections_cache.clear()
+    yield
+    _sections_cache.clear()
 
 @pytest.fixture
 def mock_wiki_processor():
     """Create a mock WikipediaProcessor"""
     mock = MagicMock()
     mock.validate_url.return_value = True
+    mock.afetch_content = AsyncMock()
     return mock
 
 @pytest.fixture
@@ -25,9 +31,9 @@ def mock_content_processor():
     mock.chunk_content.return_value = {"Introduction": "Test content", "Section 1": "More content"}
     return mock
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_wiki_content():
-    """Create a mock WikipediaContent object"""
+    """Create a mock WikipediaContent object, shared by the session since the dataclasses are frozen"""
     return WikipediaContent(
         basic_info=BasicInfo(
             title="Python (programming language)",
@@ -46,31 +52,14 @@ def mock_wiki_content():
         )
     )
 
-@pytest.fixture
-def mock_db_session():
-    """Create a fully mocked DB session."""
-    session = MagicMock()
-    session.query.return_value.filter.return_value.first.return_value = None
-    return session
-
-@pytest.fixture
-def mock_wikipedia_page():
-    """Create a mock Wikipedia page for consistent testing."""
-    page = MagicMock(spec=WikipediaPage)
-    page.id = 1
-    page.url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
-    page.title = "Python (programming language)"
-    page.content = "Python is a high-level programming language."
-    page.last_fetched = datetime.datetime.utcnow()
-    return page
-
 @pytest.fixture
 def wikipedia_service(mock_db_session, mock_wiki_processor, mock_content_processor):
     """Create a WikipediaService with mock components."""
-    service = WikipediaService(mock_db_session)
-    service.wiki_processor = mock_wiki_processor
-    service.content_processor = mock_content_processor
-    return service
+    return WikipediaService(
+        mock_db_session,
+        wiki_processor=mock_wiki_processor,
+        content_processor=mock_content_processor
+    )
 
 class TestWikipediaService:
     """Tests for the WikipediaService."""
@@ -91,51 +80,48 @@ class TestWikipediaService:
             wikipedia_service.validate_url("https://google.com")
         mock_wiki_processor.validate_url.assert_called_once()
 
-    @patch("asyncio.to_thread")
-    @patch("app.services.wikipedia_service.WikipediaPage")
     async def test_process_url_success(
-        self, mock_page_class, mock_to_thread, wikipedia_service, mock_db_session, 
+        self, wikipedia_service, mock_db_session, mock_wiki_processor,
         mock_wiki_content, mock_wikipedia_page
     ):
         """Test the full URL processing flow."""
         # Setup mocks
         url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
-        mock_to_thread.return_value = mock_wiki_content
-        
-        # Mock the WikipediaPage class to return our mock_wikipedia_page
-        mock_page_class.return_value = mock_wikipedia_page
+        mock_wiki_processor.afetch_content.return_value = mock_wiki_content
         
         # Set up db_session to return None for existing page query
         # This simulates no existing page found in the database
-        mock_db_session.query.return_value.filter.return_value.first.return_value = None
+        mock_db_session.execute.return_value.scalar_one_or_none.return_value = None
+        # The INSERT ... RETURNING hands back the stored page
+        mock_db_session.execute.return_value.scalar_one.return_value = mock_wikipedia_page
         
         # Process the URL
         page = await wikipedia_service.process_url(url)
         
         # Assertions
         assert page is mock_wikipedia_page
-        assert page.url == url
-        assert page.title == mock_wiki_content.basic_info.title
-        assert page.content == mock_wiki_content.basic_info.text
+        insert_stmt = mock_db_session.execute.call_args.args[0]
+        assert insert_stmt.compile().params["title"] == mock_wiki_content.basic_info.title
+        assert insert_stmt.compile().params["content"] == mock_wiki_content.basic_info.text
         
-        # Ensure proper database interaction
-        mock_db_session.add.assert_called_once()
+        # Ensure proper database interaction: lookup and insert, with no refresh afterwards
+        assert mock_db_session.execute.await_count == 2
         mock_db_session.commit.assert_called_once()
+        mock_db_session.refresh.assert_not_called()
         
         # Verify the right methods were called
         wikipedia_service.wiki_processor.validate_url.assert_called_once()
-        mock_to_thread.assert_called_once()
+        mock_wiki_processor.afetch_content.assert_awaited_once_with(url)
 
-    @patch("asyncio.to_thread")
     async def test_process_url_fetch_error(
-        self, mock_to_thread, wikipedia_service, mock_db_session
+        self, wikipedia_service, mock_db_session, mock_wiki_processor
     ):
         """Test error handling when fetching Wikipedia content."""
         # Set up db_session to return None for existing page query
-        mock_db_session.query.return_value.filter.return_value.first.return_value = None
+        mock_db_session.execute.return_value.scalar_one_or_none.return_value = None
         
         # Setup mocks to return None (failed fetch)
-        mock_to_thread.return_value = None
+        mock_wiki_processor.afetch_content.return_value = None
         
         # Call the service and check exception
         url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
@@ -145,7 +131,7 @@ class TestWikipediaService:
     async def test_get_page_existing(self, wikipedia_service, mock_db_session, mock_wikipedia_page):
         """Test retrieving an existing Wikipedia page."""
         # Setup mock query to return the page
-        mock_db_session.query.return_value.filter.return_value.first.return_value = mock_wikipedia_page
+        mock_db_session.get.return_value = mock_wikipedia_page
         
         # Get the page
         result = await wikipedia_service.get_page(1)
@@ -155,26 +141,26 @@ class TestWikipediaService:
         assert result.id == 1
         assert result.url == mock_wikipedia_page.url
         assert result.title == mock_wikipedia_page.title
+        mock_db_session.get.assert_called_once_with(WikipediaPage, 1)
 
     async def test_get_page_nonexistent(self, wikipedia_service, mock_db_session):
         """Test attempting to retrieve a non-existent page."""
         # Setup mock query to return None
-        mock_db_session.query.return_value.filter.return_value.first.return_value = None
+        mock_db_session.get.return_value = None
         
         # Get the page and expect None
         result = await wikipedia_service.get_page(999)
         assert result is None
 
-    @patch("asyncio.to_thread")
     async def test_refresh_page(
-        self, mock_to_thread, wikipedia_service, mock_db_session, mock_wiki_content, mock_wikipedia_page
+        self, wikipedia_service, mock_db_session, mock_wiki_processor, mock_wiki_content, mock_wikipedia_page
     ):
         """Test refreshing a Wikipedia page's content."""
         # Setup mock query to return the page
-        mock_db_session.query.return_value.filter.return_value.first.return_value = mock_wikipedia_page
+        mock_db_session.get.return_value = mock_wikipedia_page
         
         # Setup content fetch mock
-        mock_to_thread.return_value = mock_wiki_content
+        mock_wiki_processor.afetch_content.return_value = mock_wiki_content
         
         # Refresh the page
         updated_page = await wikipedia_service.refresh_page(1)
@@ -189,11 +175,46 @@ class TestWikipediaService:
         
         # Ensure proper database interaction
         mock_db_session.commit.assert_called_once()
+        mock_db_session.refresh.assert_not_called()
 
-    def test_get_sections(self, wikipedia_service, mock_db_session, mock_wikipedia_page):
+    async def test_process_urls_reports_failures(
+        self, wikipedia_service, mock_db_session, mock_wiki_processor,
+        mock_wiki_content, mock_wikipedia_page
+    ):
+        """Test that a batch upserts every fetched page and reports the URLs that failed."""
+        good_url = "https://en.wikipedia.org/wiki/Python_(programming_language)"
+        missing_url = "https://en.wikipedia.org/wiki/Missing_page"
+        broken_url = "https://en.wikipedia.org/wiki/Broken_page"
+        contents = {good_url: mock_wiki_content, missing_url: None, broken_url: Exception("timeout")}
+        
+        async def fetch(url):
+            if isinstance(contents[url], Exception):
+                raise contents[url]
+            return contents[url]
+        
+        mock_wiki_processor.afetch_content.side_effect = fetch
+        mock_db_session.execute.return_value.scalars.return_value = [mock_wikipedia_page]
+        
+        pages, errors = await wikipedia_service.process_urls([good_url, missing_url, broken_url])
+        
+        assert pages == [mock_wikipedia_page]
+        assert errors == {
+            missing_url: f"Failed to fetch content from {missing_url}",
+            broken_url: "timeout"
+        }
+        assert mock_wiki_processor.afetch_content.await_count == 3
+        
+        # One upsert statement for the whole batch
+        mock_db_session.execute.assert_awaited_once()
+        upsert_sql = str(mock_db_session.execute.call_args.args[0].compile(dialect=postgresql.dialect()))
+        assert "ON CONFLICT (url) DO UPDATE" in upsert_sql
+        assert "RETURNING" in upsert_sql
+        mock_db_session.commit.assert_called_once()
+
+    async def test_get_sections(self, wikipedia_service, mock_db_session, mock_wikipedia_page):
         """Test getting sections from a Wikipedia page."""
         # Mock the database query to return our mock page
-        mock_db_session.query.return_value.filter.return_value.first.return_value = mock_wikipedia_page
+        mock_db_session.get.return_value = mock_wikipedia_page
         
         # Mock the content processor methods
         mock_markdown = "# Section 1\nContent 1\n# Section 2\nContent 2"
@@ -206,7 +227,7 @@ class TestWikipediaService:
         wikipedia_service.content_processor.chunk_content.return_value = mock_sections
         
         # Call the method with a page ID
-        sections = wikipedia_service.get_sections(1)
+        sections = await wikipedia_service.get_sections(1)
         
         # Verify the result
         assert sections == mock_sections
@@ -214,3 +235,17 @@ class TestWikipediaService:
         wikipedia_service.content_processor.convert_to_markdown.assert_called_once_with(mock_wikipedia_page.content)
         wikipedia_service.content_processor.chunk_content.assert_called_once()
 
+    async def test_get_sections_cached(self, wikipedia_service, mock_db_session, mock_wikipedia_page):
+        """Test that unchanged page content is only converted once."""
+        mock_db_session.get.return_value = mock_wikipedia_page
+        
+        first = await wikipedia_service.get_sections(1)
+        second = await wikipedia_service.get_sections(1)
+        
+        assert first == second
+        wikipedia_service.content_processor.convert_to_markdown.assert_called_once()
+        
+        # Refreshed content hashes differently and is converted again
+        mock_wikipedia_page.content = "Python 3 is a high-level programming language."
+        await wikipedia_service.get_sections(1)
+        assert wikipedia_service.content_processor.convert_to_markdown.call_count == 2
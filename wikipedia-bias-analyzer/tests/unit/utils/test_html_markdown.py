@@ -0,0 +1,40 @@
+from app.utils.html_markdown import html_to_markdown
+
+def test_headings_and_paragraphs():
+    """Test that headings and paragraphs become ATX headers separated by blank lines."""
+    html = "<p>The <b>lead</b> and <i>intro</i>.</p><h2><span id=\"History\">History</span></h2><p>Details.</p>"
+    
+    markdown = html_to_markdown(html).strip()
+    
+    assert markdown.split("\n\n") == ["The **lead** and *intro*.", "## History", "Details."]
+
+def test_nested_lists():
+    """Test that nested and ordered lists keep their markers and indentation."""
+    html = "<ul><li>One<ul><li>Inner</li></ul></li><li>Two</li></ul><ol><li>First</li><li>Second</li></ol>"
+    
+    markdown = html_to_markdown(html).strip()
+    
+    assert markdown.split("\n\n") == ["- One\n  - Inner\n- Two", "1. First\n2. Second"]
+
+def test_skips_references_and_hidden_content():
+    """Test that footnote markers, scripts and hidden elements are dropped."""
+    html = (
+        "<p style=\"display:none\">Hidden notice</p>"
+        "<p>Claim<sup class=\"reference\"><a href=\"#cite\">[1]</a></sup> more"
+        "<sup class=\"noprint Inline-Template\">[<i>citation needed</i>]</sup>.</p>"
+        "<script>var x = 1;</script>"
+    )
+    
+    assert html_to_markdown(html).strip() == "Claim more."
+
+def test_links():
+    """Test that links keep their target."""
+    assert html_to_markdown('<p>See <a href="/wiki/Python">Python</a>.</p>').strip() == "See [Python](/wiki/Python)."
+
+def test_hidden_void_elements():
+    """Test that a hidden void element is dropped without swallowing the content after it."""
+    html = '<p>A<img style="display:none">B<br style="display:none">C</p><h2>H</h2><p>D<input type="hidden" style="display:none"></p>'
+    
+    markdown = html_to_markdown(html).strip()
+    
+    assert markdown.split("\n\n") == ["ABC", "## H", "D"]
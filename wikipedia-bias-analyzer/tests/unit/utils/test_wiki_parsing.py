@@ -0,0 +1,122 @@
+import httpx
+
+from app.utils.wiki_parsing import QUERY_PARAMS, WikipediaProcessor
+
+def links(prefix, count):
+    return [{"title": f"{prefix}{i:02d}"} for i in range(count)]
+
+def first_params(*titles):
+    return {**QUERY_PARAMS, "titles": "|".join(titles)}
+
+def test_merge_query_keeps_links_dropped():
+    """Test that links stay out of prop once every page has its preview, so they are not fetched twice."""
+    pages, aliases = {}, {}
+    response = {
+        "continue": {"clcontinue": "100|Beta", "plcontinue": "100|0|L10", "continue": "||"},
+        "query": {"pages": [{"pageid": 100, "title": "A", "categories": [{"title": "Alpha"}], "links": links("L", 10)}]}
+    }
+    params = WikipediaProcessor._merge_query(response, first_params("A"), pages, aliases)
+
+    assert "links" not in params["prop"].split("|")
+    assert "plcontinue" not in params
+    assert params["clcontinue"] == "100|Beta"
+
+    response = {
+        "continue": {"clcontinue": "100|Gamma", "continue": "||links"},
+        "query": {"pages": [{"pageid": 100, "title": "A", "categories": [{"title": "Beta"}]}]}
+    }
+    params = WikipediaProcessor._merge_query(response, params, pages, aliases)
+
+    assert "links" not in params["prop"].split("|")
+    assert "plcontinue" not in params
+
+    response = {"query": {"pages": [{"pageid": 100, "title": "A", "categories": [{"title": "Gamma"}]}]}}
+    assert WikipediaProcessor._merge_query(response, params, pages, aliases) is None
+    assert [link["title"] for link in pages["A"]["links"]] == [f"L{i:02d}" for i in range(10)]
+    assert [category["title"] for category in pages["A"]["categories"]] == ["Alpha", "Beta", "Gamma"]
+
+def test_merge_query_jumps_to_next_page_links():
+    """Test that a page with a full preview hands link paging straight to the next page id."""
+    response = {
+        "continue": {"plcontinue": "100|0|L10", "continue": "||"},
+        "query": {"pages": [
+            {"pageid": 100, "title": "A", "links": links("L", 10)},
+            {"pageid": 200, "title": "B"}
+        ]}
+    }
+    params = WikipediaProcessor._merge_query(response, first_params("A", "B"), {}, {})
+
+    assert params["plcontinue"] == "200|0|"
+    assert "links" in params["prop"].split("|")
+
+def test_merge_query_keeps_paging_a_short_preview():
+    """Test that links keep paging while the current page has fewer than the preview count."""
+    response = {
+        "continue": {"plcontinue": "100|0|L03", "continue": "||"},
+        "query": {"pages": [{"pageid": 100, "title": "A", "links": links("L", 3)}]}
+    }
+    params = WikipediaProcessor._merge_query(response, first_params("A"), {}, {})
+
+    assert params["plcontinue"] == "100|0|L03"
+
+def test_merge_query_stops_when_only_links_remain():
+    """Test that no further request is made when only links past the preview are left."""
+    response = {
+        "continue": {"plcontinue": "100|0|L10", "continue": "||"},
+        "query": {"pages": [{"pageid": 100, "title": "A", "links": links("L", 10)}]}
+    }
+    assert WikipediaProcessor._merge_query(response, first_params("A"), {}, {}) is None
+
+def test_fetch_contents_follows_continuations():
+    """Test a batched fetch against canned API responses, including redirects and continuation."""
+    responses = [
+        {
+            "continue": {"excontinue": "1", "plcontinue": "100|0|L10", "continue": "||"},
+            "query": {
+                "normalized": [{"from": "a", "to": "A"}],
+                "redirects": [{"from": "B", "to": "Bee"}],
+                "pages": [
+                    {"pageid": 100, "title": "A", "extract": "<p>A</p><h2>H</h2>", "links": links("L", 10)},
+                    {"pageid": 200, "title": "Bee"}
+                ]
+            }
+        },
+        {
+            "query": {"pages": [
+                {"pageid": 100, "title": "A"},
+                {"pageid": 200, "title": "Bee", "extract": "<p>Bee</p>", "links": links("M", 2)}
+            ]}
+        }
+    ]
+    requests = []
+
+    def handler(request):
+        requests.append(dict(request.url.params))
+        return httpx.Response(200, json=responses[len(requests) - 1])
+
+    processor = WikipediaProcessor()
+    processor.http = httpx.Client(transport=httpx.MockTransport(handler))
+    contents = processor.fetch_contents(["https://en.wikipedia.org/wiki/a", "https://en.wikipedia.org/wiki/B"])
+
+    assert requests[1]["plcontinue"] == "200|0|"
+    assert requests[1]["excontinue"] == "1"
+    page_a = contents["https://en.wikipedia.org/wiki/a"]
+    assert page_a.basic_info.title == "A"
+    assert page_a.basic_info.summary == "<p>A</p>"
+    assert len(page_a.links.internal_links) == 10
+    page_b = contents["https://en.wikipedia.org/wiki/B"]
+    assert page_b.basic_info.page_id == 200
+    assert page_b.links.internal_links == ["M00", "M01"]
+
+def test_fetch_contents_missing_and_invalid_titles():
+    """Test that missing pages and invalid titles map to None instead of failing the batch."""
+    response = {"query": {"pages": [
+        {"ns": 0, "title": "Nope", "missing": True},
+        {"title": "Bad<title", "invalidreason": "The requested page title contains invalid characters", "invalid": True}
+    ]}}
+    processor = WikipediaProcessor()
+    processor.http = httpx.Client(transport=httpx.MockTransport(lambda request: httpx.Response(200, json=response)))
+
+    contents = processor.fetch_contents(["https://en.wikipedia.org/wiki/Nope", "https://en.wikipedia.org/wiki/Bad%3Ctitle"])
+
+    assert contents == {"https://en.wikipedia.org/wiki/Nope": None, "https://en.wikipedia.org/wiki/Bad%3Ctitle": None}